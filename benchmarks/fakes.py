@@ -0,0 +1,320 @@
+import asyncio
+import datetime
+import random
+import uuid
+from collections import Counter
+from typing import Optional
+
+from elasticsearch import NotFoundError
+
+GENRE_NAMES = ["Action", "Comedy", "Drama", "Fantasy", "Horror", "Mystery", "Romance", "Thriller", "Western", "Sci-Fi"]
+
+
+def make_dataset(films: int = 1000, people: int = 500, seed: int = 42) -> dict[str, list[dict]]:
+    rng = random.Random(seed)
+    created = datetime.datetime(2021, 1, 1).isoformat()
+
+    genres = [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "genre": name, "created": created, "modified": created}
+        for name in GENRE_NAMES
+    ]
+    persons = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "birth_date": datetime.date(1950 + i % 50, 1 + i % 12, 1 + i % 28).isoformat(),
+            "created": created,
+            "modified": created,
+        }
+        for i in range(people)
+    ]
+    movies = []
+    for i in range(films):
+        film_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        rating = round(rng.uniform(1, 10), 1)
+        film_genres = rng.sample(genres, 2)
+        movies.append(
+            {
+                "id": film_id,
+                "uuid": film_id,
+                "title": f"Film {i}",
+                "description": f"Description of film {i} " * 10,
+                "creation_date": datetime.date(1950 + i % 70, 1, 1).isoformat(),
+                "rating": rating,
+                "imdb_rating": rating,
+                "type": "movie" if i % 5 else "tv_show",
+                "certificate": rng.choice(["G", "PG", "PG-13", "R", None]),
+                "genre": [genre["genre"] for genre in film_genres],
+                "genres": film_genres,
+                "people": rng.sample(persons, 5),
+            }
+        )
+    return {"movies": movies, "genres": genres, "people": persons}
+
+
+def project(source: dict, fields: Optional[list]) -> dict:
+    if not fields:
+        return source
+    return {field: source[field] for field in fields if field in source}
+
+
+def aggregate(docs: list[dict], agg: dict) -> dict:
+    # Поддержаны max, terms, histogram и date_histogram по годам для полей верхнего уровня
+    kind, params = next(iter(agg.items()))
+    values = []
+    for doc in docs:
+        value = doc.get(params["field"])
+        if value is not None:
+            values.extend(value if isinstance(value, list) else [value])
+    if kind == "max":
+        return {"value": max(values, default=None)}
+
+    counts = Counter()
+    for value in values:
+        if kind == "histogram":
+            value = value // params["interval"] * params["interval"]
+        elif kind == "date_histogram":
+            value = value[:4]
+        counts[value] += 1
+    if kind == "terms":
+        buckets = [{"key": key, "doc_count": count} for key, count in counts.most_common(params.get("size", 10))]
+    elif kind == "date_histogram":
+        buckets = [{"key_as_string": key, "key": int(key), "doc_count": counts[key]} for key in sorted(counts)]
+    else:
+        buckets = [{"key": key, "doc_count": counts[key]} for key in sorted(counts)]
+    return {"buckets": buckets}
+
+
+class FakeElasticsearch:
+    def __init__(self, dataset: dict[str, list[dict]], latency: float = 0.0):
+        self.latency = latency
+        self.indexes = dataset
+        self.by_id = {index: {doc["id"]: doc for doc in docs} for index, docs in dataset.items()}
+        self.pits: dict[str, str] = {}
+        self.calls = 0
+
+    async def _roundtrip(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    async def search(self, index: Optional[str] = None, body: Optional[dict] = None, **kwargs) -> dict:
+        await self._roundtrip()
+        return self._search(index, body)
+
+    async def msearch(self, body: list[dict], **kwargs) -> dict:
+        # Одна сетевая поездка на всю пачку: заголовки и тела поисков чередуются
+        await self._roundtrip()
+        return {
+            "responses": [self._search(header.get("index"), search) for header, search in zip(body[::2], body[1::2])]
+        }
+
+    def _search(self, index: Optional[str], body: Optional[dict]) -> dict:
+        body = body or {}
+        response = {}
+        if "pit" in body:
+            index = self.pits[body["pit"]["id"]]
+            response["pit_id"] = body["pit"]["id"]
+
+        docs = self.indexes[index]
+        size = body.get("size", 10)
+        start = body.get("from", 0)
+        if "search_after" in body:
+            start = body["search_after"][-1] + 1
+
+        hits = [
+            {"_id": doc["id"], "_source": project(doc, body.get("_source")), "sort": [position]}
+            for position, doc in enumerate(docs[start : start + size], start=start)
+        ]
+        response["hits"] = {"total": {"value": len(docs), "relation": "eq"}, "hits": hits}
+        if "aggs" in body:
+            response["aggregations"] = {name: aggregate(docs, agg) for name, agg in body["aggs"].items()}
+        return response
+
+    async def get(self, index: str, id: str, **kwargs) -> dict:
+        await self._roundtrip()
+        doc = self.by_id[index].get(id)
+        if doc is None:
+            raise NotFoundError(404, "not_found", {"_id": id, "found": False})
+        return {"_id": id, "found": True, "_source": doc}
+
+    async def mget(self, body: dict, index: str, **kwargs) -> dict:
+        await self._roundtrip()
+        docs = []
+        for entity_id in body["ids"]:
+            doc = self.by_id[index].get(entity_id)
+            docs.append({"_id": entity_id, "found": doc is not None, **({"_source": doc} if doc else {})})
+        return {"docs": docs}
+
+    async def open_point_in_time(self, index: str, keep_alive: str, **kwargs) -> dict:
+        await self._roundtrip()
+        pit_id = uuid.uuid4().hex
+        self.pits[pit_id] = index
+        return {"id": pit_id}
+
+    async def close_point_in_time(self, body: dict, **kwargs) -> dict:
+        await self._roundtrip()
+        self.pits.pop(body["id"], None)
+        return {"succeeded": True}
+
+    async def close(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, expire: int = 0, **kwargs):
+        self.commands.append((self.redis._set, (key, value)))
+
+    def sadd(self, key, *members):
+        self.commands.append((self.redis._sadd, (key, *members)))
+
+    def smembers(self, key):
+        self.commands.append((self.redis._smembers, (key,)))
+
+    def expire(self, key, timeout: int):
+        # Время жизни в заглушке не моделируется
+        self.commands.append((lambda key: 1, (key,)))
+
+    def zincrby(self, key, increment: float, member):
+        self.commands.append((self.redis._zincrby, (key, increment, member)))
+
+    def zremrangebyrank(self, key, start: int, stop: int):
+        self.commands.append((self.redis._zremrangebyrank, (key, start, stop)))
+
+    async def execute(self) -> list:
+        await self.redis._roundtrip()
+        return [command(*args) for command, args in self.commands]
+
+
+class FakeChannel:
+    # Канал подписки: сообщений в прогоне нет, ждём до отписки
+    def __init__(self):
+        self.closed = asyncio.Event()
+
+    async def wait_message(self) -> bool:
+        await self.closed.wait()
+        return False
+
+    async def get(self) -> Optional[bytes]:
+        return None
+
+
+class FakeRedis:
+    SET_IF_NOT_EXIST = "SET_IF_NOT_EXIST"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.store: dict[str, bytes] = {}
+        self.sets: dict[str, set[bytes]] = {}
+        self.zsets: dict[str, dict[bytes, float]] = {}
+        self.channels: dict[str, FakeChannel] = {}
+        self.calls = 0
+
+    async def _roundtrip(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    def flushdb(self):
+        self.store.clear()
+        self.sets.clear()
+        self.zsets.clear()
+
+    def _set(self, key: str, value) -> bool:
+        self.store[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    def _sadd(self, key: str, *members) -> int:
+        values = self.sets.setdefault(key, set())
+        added = {member if isinstance(member, bytes) else str(member).encode() for member in members} - values
+        values.update(added)
+        return len(added)
+
+    def _smembers(self, key: str) -> list[bytes]:
+        return list(self.sets.get(key, ()))
+
+    def _zrange(self, key: str) -> list[bytes]:
+        scores = self.zsets.get(key, {})
+        return sorted(scores, key=lambda member: (scores[member], member))
+
+    def _zincrby(self, key: str, increment: float, member) -> float:
+        scores = self.zsets.setdefault(key, {})
+        member = member if isinstance(member, bytes) else str(member).encode()
+        scores[member] = scores.get(member, 0) + increment
+        return scores[member]
+
+    def _zremrangebyrank(self, key: str, start: int, stop: int) -> int:
+        members = self._zrange(key)
+        stop = len(members) + stop if stop < 0 else stop
+        removed = members[start : stop + 1]
+        for member in removed:
+            del self.zsets[key][member]
+        return len(removed)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        await self._roundtrip()
+        return self.store.get(key)
+
+    async def mget(self, *keys: str) -> list[Optional[bytes]]:
+        await self._roundtrip()
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key: str, value, expire: int = 0, exist: Optional[str] = None):
+        await self._roundtrip()
+        if exist == self.SET_IF_NOT_EXIST and key in self.store:
+            return None
+        return self._set(key, value)
+
+    async def incr(self, key: str) -> int:
+        await self._roundtrip()
+        value = int(self.store.get(key, b"0")) + 1
+        self.store[key] = str(value).encode()
+        return value
+
+    async def delete(self, *keys: str) -> int:
+        await self._roundtrip()
+        return sum(self.store.pop(key, None) is not None or self.sets.pop(key, None) is not None for key in keys)
+
+    async def exists(self, *keys: str) -> int:
+        await self._roundtrip()
+        return sum(key in self.store or key in self.sets or key in self.zsets for key in keys)
+
+    async def smembers(self, key: str) -> list[bytes]:
+        await self._roundtrip()
+        return self._smembers(key)
+
+    async def zrevrange(self, key: str, start: int, stop: int) -> list[bytes]:
+        await self._roundtrip()
+        members = self._zrange(key)[::-1]
+        return members[start : None if stop == -1 else stop + 1]
+
+    async def subscribe(self, channel: str) -> list[FakeChannel]:
+        await self._roundtrip()
+        self.channels[channel] = FakeChannel()
+        return [self.channels[channel]]
+
+    async def unsubscribe(self, channel: str):
+        await self._roundtrip()
+        subscription = self.channels.pop(channel, None)
+        if subscription is not None:
+            subscription.closed.set()
+
+    async def eval(self, script: str, keys: list = (), args: list = ()):
+        # Единственный скрипт в приложении - снятие блокировки по токену
+        await self._roundtrip()
+        if self.store.get(keys[0]) == str(args[0]).encode():
+            del self.store[keys[0]]
+            return 1
+        return 0
+
+    def pipeline(self) -> FakePipeline:
+        return FakePipeline(self)
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
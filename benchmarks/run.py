@@ -0,0 +1,196 @@
+"""Нагрузочный прогон API на in-process заглушках Elasticsearch и Redis.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run --concurrency 32 --requests 2000 --es-latency 0.005 --redis-latency 0.0005
+"""
+
+import argparse
+import asyncio
+import gc
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Callable
+from unittest.mock import AsyncMock, patch
+
+from benchmarks.fakes import FakeElasticsearch, FakeRedis, make_dataset
+from src.db import redis
+from src.main import app
+
+SCENARIOS = ("cold", "warm")
+
+
+def endpoints(dataset: dict, rng: random.Random) -> dict[str, Callable[[], tuple[str, str]]]:
+    film_ids = [doc["id"] for doc in dataset["movies"]]
+    genre_ids = [doc["id"] for doc in dataset["genres"]]
+    person_ids = [doc["id"] for doc in dataset["people"]]
+    return {
+        "film_list": lambda: ("/v1/films/", f"page={rng.randint(1, 5)}&limit=50"),
+        "film_details": lambda: (f"/v1/films/{rng.choice(film_ids[:100])}", ""),
+        "genre_list": lambda: ("/v1/genres/", ""),
+        "genre_details": lambda: (f"/v1/genres/{rng.choice(genre_ids)}", ""),
+        "people_list": lambda: ("/v1/people/", f"page={rng.randint(1, 5)}&limit=50"),
+        "person_details": lambda: (f"/v1/people/{rng.choice(person_ids[:100])}", ""),
+    }
+
+
+async def request(path: str, query: str) -> int:
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"bench")],
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+    received = False
+    status = 0
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            # Клиент не отключается, пока приложение не закончит ответ
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware уже отправил 500 и пробрасывает исключение дальше, как для uvicorn
+        return status or 500
+    return status
+
+
+def flush_caches():
+    redis.redis.flushdb()
+    redis.local_cache.clear()
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+async def run_endpoint(make_request, scenario: str, total: int, concurrency: int) -> dict:
+    if scenario == "warm":
+        for _ in range(min(total, 200)):
+            await request(*make_request())
+
+    latencies = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            if scenario == "cold":
+                flush_caches()
+            path, query = make_request()
+            start = time.perf_counter()
+            status = await request(path, query)
+            latencies.append(time.perf_counter() - start)
+            errors += status >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "rps": total / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "errors": errors,
+    }
+
+
+async def allocations_per_request(make_request, scenario: str, samples: int) -> tuple[float, float]:
+    # Отдельный последовательный проход: tracemalloc заметно замедляет запросы
+    gc.collect()
+    tracemalloc.start()
+    peaks, blocks = [], []
+    for _ in range(samples):
+        if scenario == "cold":
+            flush_caches()
+        path, query = make_request()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        await request(path, query)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        peaks.append(peak - base)
+        blocks.append(sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0))
+    tracemalloc.stop()
+    return statistics.mean(peaks) / 1024, statistics.mean(blocks)
+
+
+async def main(args: argparse.Namespace):
+    dataset = make_dataset(films=args.films, people=args.people, seed=args.seed)
+    rng = random.Random(args.seed)
+    # Хуки старта те же, что в сервисе (каталог жанров, подсказки, подписка на инвалидацию, прогрев),
+    # только клиенты вместо настоящих возвращают заглушки
+    fake_es = FakeElasticsearch(dataset, latency=args.es_latency)
+    fake_redis = FakeRedis(latency=args.redis_latency)
+    with patch("src.main.AsyncElasticsearch", return_value=fake_es), patch(
+        "src.main.aioredis.create_redis_pool", AsyncMock(return_value=fake_redis)
+    ):
+        await app.router.startup()
+    try:
+        await run_all(args, dataset, rng)
+    finally:
+        await app.router.shutdown()
+
+
+async def run_all(args: argparse.Namespace, dataset: dict, rng: random.Random):
+    selected = endpoints(dataset, rng)
+    if args.endpoints:
+        selected = {name: selected[name] for name in args.endpoints}
+
+    header = (
+        f"{'endpoint':<16}{'scenario':<10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'errors':>8}{'peak KiB/req':>14}{'blocks/req':>12}"
+    )
+    print(header)
+    print("-" * len(header))
+    for scenario in args.scenarios:
+        for name, make_request in selected.items():
+            flush_caches()
+            result = await run_endpoint(make_request, scenario, args.requests, args.concurrency)
+            peak_kib, blocks = await allocations_per_request(make_request, scenario, args.alloc_samples)
+            print(
+                f"{name:<16}{scenario:<10}{result['rps']:>10.0f}{result['p50'] * 1000:>10.2f}"
+                f"{result['p95'] * 1000:>10.2f}{result['p99'] * 1000:>10.2f}{result['errors']:>8}"
+                f"{peak_kib:>14.1f}{blocks:>12.0f}"
+            )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark API endpoints against in-process ES and Redis fakes")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint and scenario")
+    parser.add_argument("--es-latency", type=float, default=0.005, help="seconds per Elasticsearch call")
+    parser.add_argument("--redis-latency", type=float, default=0.0005, help="seconds per Redis call")
+    parser.add_argument("--films", type=int, default=1000)
+    parser.add_argument("--people", type=int, default=500)
+    parser.add_argument("--alloc-samples", type=int, default=50)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--endpoints", nargs="+", help="subset of endpoints to run")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,50 @@
+import time
+from typing import Callable
+
+from fastapi import APIRouter, Request, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+
+from src.core.config import LATENCY_BUDGET
+from src.core.metrics import REQUEST_LATENCY, current_route, registry
+from src.services.budget import request_deadline
+from src.services.dataloader import request_loaders
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class InstrumentedRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+        budget = getattr(self.endpoint, "latency_budget", LATENCY_BUDGET)
+
+        async def instrumented_handler(request: Request) -> Response:
+            token = current_route.set(route)
+            # Загрузчики вложенных сущностей общие для всего запроса
+            loaders_token = request_loaders.set({})
+            deadline_token = request_deadline.set(time.monotonic() + budget)
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except Exception as exc:
+                status = getattr(exc, "status_code", status)
+                raise
+            finally:
+                REQUEST_LATENCY.observe(time.perf_counter() - start, route=route, method=request.method, status=status)
+                request_deadline.reset(deadline_token)
+                request_loaders.reset(loaders_token)
+                current_route.reset(token)
+
+        return instrumented_handler
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
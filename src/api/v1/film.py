@@ -2,14 +2,36 @@ from enum import Enum
 from http import HTTPStatus
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
+from src.api.metrics import InstrumentedRoute
 from src.constants import SortOrder
-from src.models.film import Film
+from src.core.config import (
+    BATCH_MAX_IDS,
+    CURSOR_USE_PIT,
+    FACETS_CACHE_TTL,
+    HTTP_CACHE_MAX_AGE,
+    LATENCY_BUDGET_DETAIL,
+    SUGGEST_MAX_LIMIT,
+)
+from src.models.facet import FilmFacets
+from src.models.film import Film, FilmShort, MovieType
+from src.models.suggestion import Suggestion
+from src.services import suggest
+from src.services.budget import latency_budget
 from src.services.film import FilmService, get_film_service
-from src.utils import cached
+from src.services.pagination import InvalidCursorError
+from src.services.search import text_queries, with_filters
+from src.utils import cached, cached_batch, ndjson_stream, page_response
+
+FILM_LIST_SOURCE = list(FilmShort.__fields__)
+FILM_SEARCH_FIELDS = ["title^5", "description^4", "genre^3", "actors_names^3", "writers_names^2", "director"]
+# Изменение жанра или персоны сбрасывает закешированные карточки фильмов, в которые они вложены
+FILM_TAG_FIELDS = {"genres": "genres", "people": "people"}
 
 router = APIRouter(
+    route_class=InstrumentedRoute,
     prefix="/films",
 )
 
@@ -20,22 +42,66 @@ class SortFieldFilm(str, Enum):
     IMDB_RATING = "imdb_rating"
 
 
+def film_filters(
+    genre: Optional[list[str]],
+    film_type: Optional[MovieType],
+    certificate: Optional[str],
+    rating_from: Optional[float],
+    rating_to: Optional[float],
+    year_from: Optional[int],
+    year_to: Optional[int],
+) -> list[dict]:
+    filters = []
+    if genre:
+        filters.append({"terms": {"genre": genre}})
+    if film_type is not None:
+        filters.append({"term": {"type": MovieType(film_type).value}})
+    if certificate:
+        filters.append({"term": {"certificate": certificate}})
+    rating = {bound: value for bound, value in (("gte", rating_from), ("lte", rating_to)) if value is not None}
+    if rating:
+        filters.append({"range": {"imdb_rating": rating}})
+    # lte с форматом yyyy Elasticsearch округляет до конца года
+    years = {bound: str(value) for bound, value in (("gte", year_from), ("lte", year_to)) if value is not None}
+    if years:
+        filters.append({"range": {"creation_date": {**years, "format": "yyyy"}}})
+    return filters
+
+
+def film_queries(search_query: Optional[str], filters: list[dict]) -> tuple[Optional[dict], Optional[dict]]:
+    # Запрос и нечёткий запрос второй фазы с фильтрами каталога
+    query, fuzzy_query = text_queries(search_query, FILM_SEARCH_FIELDS) if search_query else (None, None)
+    if filters:
+        query = with_filters(query, filters)
+        if fuzzy_query is not None:
+            fuzzy_query = with_filters(fuzzy_query, filters)
+    return query, fuzzy_query
+
+
 @router.get(
     "/",
-    response_model=list[Film],
+    response_model=list[FilmShort],
     summary="Получение списка произведений",
     response_description="Список произведений",
     tags=["film_list"],
 )
-@cached(decoder=Film, many=True)
+@cached(namespace="films")
 async def film_list(
     search_query: Optional[str] = "",
     sort_order: SortOrder = SortOrder.ASC,
     sort: SortFieldFilm = SortFieldFilm.ID,
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    genre: Optional[list[str]] = Query(None),  # noqa B008
+    film_type: Optional[MovieType] = Query(None, alias="type"),  # noqa B008
+    certificate: Optional[str] = None,
+    rating_from: Optional[float] = None,
+    rating_to: Optional[float] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
     film_service: FilmService = Depends(get_film_service),  # noqa B008
-) -> list[Film]:
+) -> list[FilmShort]:
     sort_value = sort.value
     if sort_value == SortFieldFilm.TITLE.value:
         sort_value = f"{SortFieldFilm.TITLE.value}.raw"
@@ -44,19 +110,103 @@ async def film_list(
         "size": limit,
         "from": (page - 1) * limit,
         "sort": [{sort_value: sort_order.value}],
-        "_source": ["id", "title", "imdb_rating"],
+        "_source": FILM_LIST_SOURCE,
     }
 
-    if search_query:
-        es_query["query"] = {
-            "multi_match": {
-                "query": search_query,
-                "fuzziness": "auto",
-                "fields": ["title^5", "description^4", "genre^3", "actors_names^3", "writers_names^2", "director"],
-            }
-        }
+    es_query["query"], fuzzy_query = film_queries(
+        search_query, film_filters(genre, film_type, certificate, rating_from, rating_to, year_from, year_to)
+    )
+    if es_query["query"] is None:
+        del es_query["query"]
+
+    if cursor is not None:
+        # Страницы одного курсора должны идти по одному запросу: выбор фазы не делаем, сразу нечёткий
+        if fuzzy_query is not None:
+            es_query["query"] = fuzzy_query
+        try:
+            films, next_cursor = await film_service.get_page(es_query, cursor, FilmShort)
+        except InvalidCursorError:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="invalid cursor")
+        return page_response(films, next_cursor, store=not CURSOR_USE_PIT)
+
+    return await film_service.get_list(es_query, FilmShort, fuzzy_query)
+
+
+@router.get(
+    "/batch",
+    response_model=list[Film],
+    summary="Получение нескольких произведений по списку id",
+    response_description="Список найденных произведений",
+    tags=["film_batch"],
+)
+async def film_batch(
+    request: Request,
+    ids: list[str] = Query(...),  # noqa B008
+    film_service: FilmService = Depends(get_film_service),  # noqa B008
+) -> Response:
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"no more than {BATCH_MAX_IDS} ids allowed")
+
+    return await cached_batch("films", ids, film_service.get_by_ids, tag_fields=FILM_TAG_FIELDS, request=request)
+
+
+@router.get(
+    "/export",
+    summary="Выгрузка всех произведений в формате NDJSON",
+    response_description="Поток произведений, по одному JSON-документу на строку",
+    tags=["film_export"],
+)
+async def film_export(film_service: FilmService = Depends(get_film_service)) -> StreamingResponse:  # noqa B008
+    return StreamingResponse(
+        ndjson_stream(film_service.iter_sources(FILM_LIST_SOURCE)),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get(
+    "/facets",
+    response_model=FilmFacets,
+    summary="Фасеты каталога произведений: жанры, типы, сертификаты, рейтинг и годы",
+    response_description="Значения фильтров с числом произведений",
+    tags=["film_facets"],
+)
+@cached(namespace="films", soft_ttl=FACETS_CACHE_TTL)
+async def film_facets(
+    search_query: Optional[str] = "",
+    genre: Optional[list[str]] = Query(None),  # noqa B008
+    film_type: Optional[MovieType] = Query(None, alias="type"),  # noqa B008
+    certificate: Optional[str] = None,
+    rating_from: Optional[float] = None,
+    rating_to: Optional[float] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    film_service: FilmService = Depends(get_film_service),  # noqa B008
+) -> FilmFacets:
+    query, fuzzy_query = film_queries(
+        search_query, film_filters(genre, film_type, certificate, rating_from, rating_to, year_from, year_to)
+    )
+    return await film_service.facets(query, fuzzy_query)
+
+
+@router.get(
+    "/suggest",
+    response_model=list[Suggestion],
+    summary="Подсказки по началу названия произведения или имени персоны",
+    response_description="Список подсказок",
+    tags=["film_suggest"],
+)
+async def film_suggest(
+    prefix: str = Query(..., min_length=1, max_length=100),  # noqa B008
+    limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT),  # noqa B008
+    film_service: FilmService = Depends(get_film_service),  # noqa B008
+) -> Response:
+    # Вызывается на каждое нажатие клавиши: отвечаем из индекса в памяти, без Redis и Elasticsearch
+    if suggest.suggest_index is not None:
+        suggestions = suggest.suggest_index.search(prefix, limit)
+    else:
+        suggestions = await film_service.suggest(prefix, limit)
 
-    return await film_service.get_list(es_query)
+    return ORJSONResponse(suggestions, headers={"cache-control": f"public, max-age={HTTP_CACHE_MAX_AGE}"})
 
 
 @router.get(
@@ -66,10 +216,11 @@ async def film_list(
     response_description="Информация о конкретном произведении",
     tags=["film_details"],
 )
-@cached(decoder=Film)
+@latency_budget(LATENCY_BUDGET_DETAIL)
+@cached(namespace="films", entity_id_param="film_id", tag_fields=FILM_TAG_FIELDS)
 async def film_details(film_id: str, film_service: FilmService = Depends(get_film_service)) -> Film:  # noqa B008
     film = await film_service.get_by_id(film_id)
     if not film:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="film not found")
 
-    return Film(id=film.id, title=film.title)
+    return film
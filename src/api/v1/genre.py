@@ -2,14 +2,33 @@ from enum import Enum
 from http import HTTPStatus
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
+from src.api.metrics import InstrumentedRoute
 from src.constants import SortOrder
-from src.models.genre import Genre
+from src.core.config import BATCH_MAX_IDS, CURSOR_USE_PIT, EXPORT_BATCH_SIZE, LATENCY_BUDGET_DETAIL
+from src.models.genre import Genre, GenreShort
+from src.services import genre_catalogue
+from src.services.budget import latency_budget
 from src.services.genre import GenreService, get_genre_service
-from src.utils import cached
+from src.services.pagination import InvalidCursorError
+from src.services.search import text_queries
+from src.utils import (
+    REQUEST_PARAM,
+    cached,
+    cached_batch,
+    conditional_response,
+    encode_response,
+    ndjson_stream,
+    page_response,
+)
+
+GENRE_LIST_SOURCE = list(GenreShort.__fields__)
+GENRE_SEARCH_FIELDS = ["genre^3"]
 
 router = APIRouter(
+    route_class=InstrumentedRoute,
     prefix="/genres",
 )
 
@@ -21,20 +40,55 @@ class SortFieldGenre(str, Enum):
 
 @router.get(
     "/",
-    response_model=list[Genre],
+    response_model=list[GenreShort],
     summary="Получение списка жанров",
     response_description="Список жанров",
     tags=["genres_list"],
 )
-@cached(decoder=Genre)
 async def genre_list(
+    request: Request,
+    search_query: Optional[str] = "",
+    sort_order: SortOrder = SortOrder.ASC,
+    sort: SortFieldGenre = SortFieldGenre.ID,
+    page: int = 1,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    genre_service: GenreService = Depends(get_genre_service),  # noqa B008
+) -> Response:
+    # Каталог в памяти отвечает без Redis: кешировать то, что уже лежит в памяти, незачем
+    catalogue = genre_catalogue.catalogue
+    if catalogue is not None:
+        if cursor is not None:
+            try:
+                genres, next_cursor = catalogue.get_page(sort.value, sort_order.value, search_query, limit, cursor)
+            except InvalidCursorError:
+                raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="invalid cursor")
+            return page_response(genres, next_cursor)
+        genres = catalogue.get_list(sort.value, sort_order.value, search_query, page, limit)
+        return conditional_response(request, encode_response(genres, list[GenreShort]))
+
+    return await genre_list_elastic(
+        search_query=search_query,
+        sort_order=sort_order,
+        sort=sort,
+        page=page,
+        limit=limit,
+        cursor=cursor,
+        genre_service=genre_service,
+        **{REQUEST_PARAM: request},
+    )
+
+
+@cached(namespace="genres")
+async def genre_list_elastic(
     search_query: Optional[str] = "",
     sort_order: SortOrder = SortOrder.ASC,
     sort: SortFieldGenre = SortFieldGenre.ID,
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
     genre_service: GenreService = Depends(get_genre_service),  # noqa B008
-) -> list[Genre]:
+) -> list[GenreShort]:
     sort_value = sort.value
     if sort_value == SortFieldGenre.GENRE.value:
         sort_value = f"{SortFieldGenre.GENRE.value}.raw"
@@ -43,19 +97,67 @@ async def genre_list(
         "size": limit,
         "from": (page - 1) * limit,
         "sort": [{sort_value: sort_order.value}],
-        "_source": ["id", "genre"],
+        "_source": GENRE_LIST_SOURCE,
     }
 
+    fuzzy_query = None
     if search_query:
-        es_query["query"] = {
-            "multi_match": {
-                "query": search_query,
-                "fuzziness": "auto",
-                "fields": ["genre^3"],
-            }
-        }
+        es_query["query"], fuzzy_query = text_queries(search_query, GENRE_SEARCH_FIELDS)
+
+    if cursor is not None:
+        # Страницы одного курсора должны идти по одному запросу: выбор фазы не делаем, сразу нечёткий
+        if fuzzy_query is not None:
+            es_query["query"] = fuzzy_query
+        try:
+            genres, next_cursor = await genre_service.get_page(es_query, cursor, GenreShort)
+        except InvalidCursorError:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="invalid cursor")
+        return page_response(genres, next_cursor, store=not CURSOR_USE_PIT)
 
-    return await genre_service.get_list(es_query)
+    return await genre_service.get_list(es_query, GenreShort, fuzzy_query)
+
+
+@router.get(
+    "/batch",
+    response_model=list[Genre],
+    summary="Получение нескольких жанров по списку id",
+    response_description="Список найденных жанров",
+    tags=["genre_batch"],
+)
+async def genre_batch(
+    request: Request,
+    ids: list[str] = Query(...),  # noqa B008
+    genre_service: GenreService = Depends(get_genre_service),  # noqa B008
+) -> Response:
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"no more than {BATCH_MAX_IDS} ids allowed")
+
+    catalogue = genre_catalogue.catalogue
+    if catalogue is not None:
+        found = await catalogue.get_by_ids(ids)
+        return conditional_response(
+            request,
+            encode_response([found[genre_id] for genre_id in dict.fromkeys(ids) if genre_id in found], list[Genre]),
+        )
+    return await cached_batch("genres", ids, genre_service.get_by_ids, request=request)
+
+
+@router.get(
+    "/export",
+    summary="Выгрузка всех жанров в формате NDJSON",
+    response_description="Поток жанров, по одному JSON-документу на строку",
+    tags=["genre_export"],
+)
+async def genre_export(genre_service: GenreService = Depends(get_genre_service)) -> StreamingResponse:  # noqa B008
+    catalogue = genre_catalogue.catalogue
+    if catalogue is not None:
+        sources = catalogue.iter_sources(EXPORT_BATCH_SIZE)
+    else:
+        sources = genre_service.iter_sources(GENRE_LIST_SOURCE)
+    return StreamingResponse(
+        ndjson_stream(sources),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.get(
@@ -65,10 +167,26 @@ async def genre_list(
     response_description="Информация о конкретном жанре",
     tags=["genre_details"],
 )
-@cached(decoder=Genre)
-async def genre_details(genre_id: str, genre_service: GenreService = Depends(get_genre_service)) -> Genre:  # noqa B008
+@latency_budget(LATENCY_BUDGET_DETAIL)
+async def genre_details(
+    request: Request, genre_id: str, genre_service: GenreService = Depends(get_genre_service)  # noqa B008
+) -> Response:
+    catalogue = genre_catalogue.catalogue
+    if catalogue is not None:
+        genre = catalogue.get(genre_id)
+        if not genre:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="genre not found")
+        return conditional_response(request, encode_response(genre, Genre))
+
+    return await genre_details_elastic(genre_id=genre_id, genre_service=genre_service, **{REQUEST_PARAM: request})
+
+
+@cached(namespace="genres", entity_id_param="genre_id")
+async def genre_details_elastic(
+    genre_id: str, genre_service: GenreService = Depends(get_genre_service)  # noqa B008
+) -> Genre:
     genre = await genre_service.get_by_id(genre_id)
     if not genre:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="genre not found")
 
-    return Genre(id=genre.id, genre=genre.genre, created=genre.created, modified=genre.modified)
+    return genre
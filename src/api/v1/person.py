@@ -2,14 +2,24 @@ from enum import Enum
 from http import HTTPStatus
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 
+from src.api.metrics import InstrumentedRoute
 from src.constants import SortOrder
-from src.models.person import Person
+from src.core.config import BATCH_MAX_IDS, CURSOR_USE_PIT, LATENCY_BUDGET_DETAIL
+from src.models.person import Person, PersonShort
+from src.services.budget import latency_budget
+from src.services.pagination import InvalidCursorError
 from src.services.person import PersonService, get_person_service
-from src.utils import cached
+from src.services.search import text_queries
+from src.utils import cached, cached_batch, ndjson_stream, page_response
+
+PERSON_LIST_SOURCE = list(PersonShort.__fields__)
+PERSON_SEARCH_FIELDS = ["first_name^2", "last_name^2"]
 
 router = APIRouter(
+    route_class=InstrumentedRoute,
     prefix="/people",
 )
 
@@ -22,20 +32,21 @@ class SortFieldPerson(str, Enum):
 
 @router.get(
     "/",
-    response_model=list[Person],
+    response_model=list[PersonShort],
     summary="Получение списка участников в произведении",
     response_description="Список участников в произведении",
     tags=["people_list"],
 )
-@cached(decoder=Person)
+@cached(namespace="people")
 async def people_list(
     search_query: Optional[str] = "",
     sort_order: SortOrder = SortOrder.ASC,
     sort: SortFieldPerson = SortFieldPerson.ID,
     page: int = 1,
     limit: int = 50,
+    cursor: Optional[str] = None,
     person_service: PersonService = Depends(get_person_service),  # noqa B008
-) -> list[Person]:
+) -> list[PersonShort]:
     sort_value = sort.value
     if sort_value in [SortFieldPerson.FIRST_NAME.value, SortFieldPerson.LAST_NAME.value]:
         sort_value = f"{sort_value}.raw"
@@ -44,19 +55,55 @@ async def people_list(
         "size": limit,
         "from": (page - 1) * limit,
         "sort": [{sort_value: sort_order.value}],
-        "_source": ["id", "first_name", "last_name"],
+        "_source": PERSON_LIST_SOURCE,
     }
 
+    fuzzy_query = None
     if search_query:
-        es_query["query"] = {
-            "multi_match": {
-                "query": search_query,
-                "fuzziness": "auto",
-                "fields": ["first_name^2", "last_name^2"],
-            }
-        }
+        es_query["query"], fuzzy_query = text_queries(search_query, PERSON_SEARCH_FIELDS)
+
+    if cursor is not None:
+        # Страницы одного курсора должны идти по одному запросу: выбор фазы не делаем, сразу нечёткий
+        if fuzzy_query is not None:
+            es_query["query"] = fuzzy_query
+        try:
+            people, next_cursor = await person_service.get_page(es_query, cursor, PersonShort)
+        except InvalidCursorError:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail="invalid cursor")
+        return page_response(people, next_cursor, store=not CURSOR_USE_PIT)
+
+    return await person_service.get_list(es_query, PersonShort, fuzzy_query)
 
-    return await person_service.get_list(es_query)
+
+@router.get(
+    "/batch",
+    response_model=list[Person],
+    summary="Получение нескольких личностей по списку id",
+    response_description="Список найденных личностей",
+    tags=["people_batch"],
+)
+async def people_batch(
+    request: Request,
+    ids: list[str] = Query(...),  # noqa B008
+    person_service: PersonService = Depends(get_person_service),  # noqa B008
+) -> Response:
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"no more than {BATCH_MAX_IDS} ids allowed")
+
+    return await cached_batch("people", ids, person_service.get_by_ids, request=request)
+
+
+@router.get(
+    "/export",
+    summary="Выгрузка всех личностей в формате NDJSON",
+    response_description="Поток личностей, по одному JSON-документу на строку",
+    tags=["people_export"],
+)
+async def people_export(person_service: PersonService = Depends(get_person_service)) -> StreamingResponse:  # noqa B008
+    return StreamingResponse(
+        ndjson_stream(person_service.iter_sources(PERSON_LIST_SOURCE)),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.get(
@@ -66,7 +113,8 @@ async def people_list(
     response_description="Информация о конкретной личности",
     tags=["person_details"],
 )
-@cached(decoder=Person)
+@latency_budget(LATENCY_BUDGET_DETAIL)
+@cached(namespace="people", entity_id_param="person_id")
 async def person_details(
     person_id: str, person_service: PersonService = Depends(get_person_service)  # noqa B008
 ) -> Person:
@@ -13,3 +13,116 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CACHE_TTL = int(os.getenv("CACHE_TTL", 60 * 5))  # 5 минут
 
 API_V1_PREFIX = "/v1"
+
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", 10))  # секунды
+LOCAL_CACHE_MAX_ITEMS = int(os.getenv("LOCAL_CACHE_MAX_ITEMS", 1024))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", 32 * 1024 * 1024))  # 32 МБ
+
+# Межпроцессная блокировка на промах кеша: один воркер ходит в ES, остальные ждут значение
+CACHE_LOCK_ENABLED = os.getenv("CACHE_LOCK_ENABLED", "true").lower() == "true"
+CACHE_LOCK_TTL = int(os.getenv("CACHE_LOCK_TTL", 5))  # секунды
+CACHE_LOCK_POLL_INTERVAL = float(os.getenv("CACHE_LOCK_POLL_INTERVAL", 0.05))  # секунды
+
+# Сколько ещё отдаём устаревшее значение после CACHE_TTL, обновляя его в фоне; 0 - отключить
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 60 * 60))  # 1 час
+
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 100))
+
+# Курсорная пагинация: фиксировать снимок индекса через point-in-time
+CURSOR_USE_PIT = os.getenv("CURSOR_USE_PIT", "false").lower() == "true"
+CURSOR_PIT_KEEP_ALIVE = os.getenv("CURSOR_PIT_KEEP_ALIVE", "1m")
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+# Как долго воркер держит в памяти номер поколения пространства имён кеша
+CACHE_GENERATION_TTL = float(os.getenv("CACHE_GENERATION_TTL", 1))  # секунды
+
+# Сжатие значений в Redis: none, zlib, zstd или lz4 (zstd и lz4 - опциональные зависимости)
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")
+CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", 3))
+CACHE_COMPRESSION_MIN_SIZE = int(os.getenv("CACHE_COMPRESSION_MIN_SIZE", 1024))  # байты
+
+# Прогрев кеша самыми частыми запросами при старте и по расписанию
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_TOP_KEYS = int(os.getenv("WARMUP_TOP_KEYS", 200))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", 8))
+WARMUP_INTERVAL = float(os.getenv("WARMUP_INTERVAL", 60))  # секунды
+WARMUP_STARTUP_TIMEOUT = float(os.getenv("WARMUP_STARTUP_TIMEOUT", 10))  # секунды
+WARMUP_HOT_KEYS_TRACKED = int(os.getenv("WARMUP_HOT_KEYS_TRACKED", 2000))
+WARMUP_HOT_KEYS_TTL = int(os.getenv("WARMUP_HOT_KEYS_TTL", 60 * 60 * 24))  # сутки
+
+# Канал, в который ETL публикует изменённые сущности
+CACHE_INVALIDATION_ENABLED = os.getenv("CACHE_INVALIDATION_ENABLED", "true").lower() == "true"
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+CACHE_INVALIDATION_RETRY_INTERVAL = float(os.getenv("CACHE_INVALIDATION_RETRY_INTERVAL", 1))  # секунды
+
+# Cache-Control: max-age для браузеров и nginx; изменения доходят до клиентов с этой задержкой
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 60))  # секунды
+
+# Подсказки по префиксу: индекс названий фильмов и имён в памяти процесса
+SUGGEST_INDEX_ENABLED = os.getenv("SUGGEST_INDEX_ENABLED", "true").lower() == "true"
+SUGGEST_MAX_FILMS = int(os.getenv("SUGGEST_MAX_FILMS", 50000))  # в индекс попадают фильмы с наибольшим рейтингом
+SUGGEST_MAX_PEOPLE = int(os.getenv("SUGGEST_MAX_PEOPLE", 50000))
+SUGGEST_MAX_WORDS = int(os.getenv("SUGGEST_MAX_WORDS", 4))  # с какого по счёту слова ещё ищем по префиксу
+SUGGEST_MAX_LIMIT = int(os.getenv("SUGGEST_MAX_LIMIT", 20))
+SUGGEST_SHORT_PREFIX = int(os.getenv("SUGGEST_SHORT_PREFIX", 2))  # для коротких префиксов ответ посчитан заранее
+SUGGEST_REFRESH_INTERVAL = int(os.getenv("SUGGEST_REFRESH_INTERVAL", 60 * 10))  # 10 минут
+
+# Каталог жанров в памяти процесса; Elasticsearch нужен только для обновления
+GENRE_CATALOGUE_ENABLED = os.getenv("GENRE_CATALOGUE_ENABLED", "true").lower() == "true"
+GENRE_CATALOGUE_REFRESH_INTERVAL = int(os.getenv("GENRE_CATALOGUE_REFRESH_INTERVAL", 60))  # секунды
+GENRE_CATALOGUE_STARTUP_TIMEOUT = float(os.getenv("GENRE_CATALOGUE_STARTUP_TIMEOUT", 10))  # секунды
+
+# Адаптивное ограничение параллельных запросов к Elasticsearch (AIMD по задержке ответа)
+ES_LIMITER_ENABLED = os.getenv("ES_LIMITER_ENABLED", "true").lower() == "true"
+ES_LIMIT_INITIAL = int(os.getenv("ES_LIMIT_INITIAL", 20))
+ES_LIMIT_MIN = int(os.getenv("ES_LIMIT_MIN", 2))
+ES_LIMIT_MAX = int(os.getenv("ES_LIMIT_MAX", 200))
+ES_LIMIT_LATENCY_TARGET = float(os.getenv("ES_LIMIT_LATENCY_TARGET", 0.25))  # секунды; медленнее - лимит снижается
+ES_LIMIT_BACKOFF = float(os.getenv("ES_LIMIT_BACKOFF", 0.9))  # во сколько раз снижается лимит
+ES_LIMIT_QUEUE = int(os.getenv("ES_LIMIT_QUEUE", 100))  # сверх лимита ждут не больше стольких запросов
+ES_LIMIT_QUEUE_TIMEOUT = float(os.getenv("ES_LIMIT_QUEUE_TIMEOUT", 1))  # секунды ожидания в очереди
+
+# Предохранитель перед Elasticsearch: при доле ошибок выше порога запросы сразу получают отказ
+ES_BREAKER_ENABLED = os.getenv("ES_BREAKER_ENABLED", "true").lower() == "true"
+ES_BREAKER_FAILURE_RATE = float(os.getenv("ES_BREAKER_FAILURE_RATE", 0.5))
+ES_BREAKER_MIN_CALLS = int(os.getenv("ES_BREAKER_MIN_CALLS", 20))  # меньше вызовов в окне - не размыкаем
+ES_BREAKER_WINDOW = float(os.getenv("ES_BREAKER_WINDOW", 10))  # секунды
+ES_BREAKER_RESET_TIMEOUT = float(os.getenv("ES_BREAKER_RESET_TIMEOUT", 5))  # секунды до пробного вызова
+ES_BREAKER_HALF_OPEN_CALLS = int(os.getenv("ES_BREAKER_HALF_OPEN_CALLS", 1))  # одновременных пробных вызовов
+
+# Сколько хранится резервная копия ответа на случай недоступности Elasticsearch
+CACHE_FALLBACK_TTL = int(os.getenv("CACHE_FALLBACK_TTL", 60 * 60 * 24 * 7))  # 7 дней
+
+# Бюджет времени запроса к API на обращения к Elasticsearch; таймауты вызовов берутся из его остатка
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", 10))  # секунды; для фоновых задач без бюджета
+LATENCY_BUDGET = float(os.getenv("LATENCY_BUDGET", 1))  # секунды; списки, пачки, подсказки
+LATENCY_BUDGET_DETAIL = float(os.getenv("LATENCY_BUDGET_DETAIL", 0.5))  # секунды; карточки по id
+ES_SHARD_TIMEOUT_SHARE = float(os.getenv("ES_SHARD_TIMEOUT_SHARE", 0.8))  # доля остатка на поиск в шардах
+
+# Дублирующий запрос на чтение, если первый не ответил за квантиль недавних задержек
+ES_HEDGE_ENABLED = os.getenv("ES_HEDGE_ENABLED", "true").lower() == "true"
+ES_HEDGE_QUANTILE = float(os.getenv("ES_HEDGE_QUANTILE", 0.95))
+ES_HEDGE_MIN_DELAY = float(os.getenv("ES_HEDGE_MIN_DELAY", 0.01))  # секунды
+ES_HEDGE_WINDOW = int(os.getenv("ES_HEDGE_WINDOW", 1000))  # по скольким последним ответам считаем квантиль
+ES_HEDGE_MIN_SAMPLES = int(os.getenv("ES_HEDGE_MIN_SAMPLES", 100))  # меньше замеров - не дублируем
+ES_HEDGE_RATIO = float(os.getenv("ES_HEDGE_RATIO", 0.05))  # не больше такой доли вызовов получает дубль
+
+# Кеш сырых результатов поиска по телу запроса к Elasticsearch, общий для всех эндпоинтов и проекций
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 60 * 5))  # 5 минут
+
+# Поиски, пришедшие почти одновременно, отправляются в Elasticsearch одним _msearch
+ES_MSEARCH_ENABLED = os.getenv("ES_MSEARCH_ENABLED", "true").lower() == "true"
+ES_MSEARCH_WINDOW = float(os.getenv("ES_MSEARCH_WINDOW", 0))  # секунды; 0 - поиски одной итерации цикла событий
+ES_MSEARCH_MAX_BATCH = int(os.getenv("ES_MSEARCH_MAX_BATCH", 32))  # полная пачка уходит, не дожидаясь окна
+
+# Поиск по search_query: fuzzy - сразу нечёткий запрос; two_phase - сначала точный и по префиксу фразы,
+# нечёткий - только если точных совпадений меньше SEARCH_EXACT_MIN_HITS
+SEARCH_STRATEGY = os.getenv("SEARCH_STRATEGY", "two_phase")
+SEARCH_EXACT_MIN_HITS = int(os.getenv("SEARCH_EXACT_MIN_HITS", 10))
+
+# Фасеты для фильтров каталога фильмов: меняются медленно, поэтому кешируются дольше списков
+FACETS_CACHE_TTL = int(os.getenv("FACETS_CACHE_TTL", 60 * 30))  # 30 минут
+FACETS_TERMS_SIZE = int(os.getenv("FACETS_TERMS_SIZE", 100))  # значений в фасете жанров, типов и сертификатов
+FACETS_RATING_INTERVAL = float(os.getenv("FACETS_RATING_INTERVAL", 1))  # ширина интервала рейтинга
@@ -0,0 +1,190 @@
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+# Маршрут текущего запроса, чтобы метрики из сервисов и кеша размечались по эндпоинту
+current_route: ContextVar[str] = ContextVar("current_route", default="")
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labelnames: tuple, values: tuple, extra: Optional[dict] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.extend(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def label_values(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        pass
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self.label_values(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self.label_values(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._functions: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self.label_values(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels):
+        # Значение вычисляется в момент отдачи /metrics
+        self._functions[self.label_values(labels)] = function
+
+    def samples(self) -> Iterator[str]:
+        values = dict(self._values)
+        values.update({key: function() for key, function in self._functions.items()})
+        for key, value in values.items():
+            yield f"{self.name}{format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.label_values(labels)
+        if key not in self._values:
+            self._values[key] = ([0] * len(self.buckets), [0, 0.0])
+        counts, totals = self._values[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        totals[0] += 1
+        totals[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, (count, total)) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{format_labels(self.labelnames, key, {'le': bound})} {cumulative}"
+            yield f"{self.name}_bucket{format_labels(self.labelnames, key, {'le': '+Inf'})} {count}"
+            yield f"{self.name}_count{format_labels(self.labelnames, key)} {count}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, key)} {total}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency", ("route", "method", "status"))
+)
+STAGE_LATENCY = registry.register(
+    Histogram("stage_duration_seconds", "Latency of a request processing stage", ("route", "stage"))
+)
+CACHE_REQUESTS = registry.register(
+    Counter("cache_requests_total", "Cached endpoint lookups by result", ("route", "result"))
+)
+QUERY_CACHE_REQUESTS = registry.register(
+    Counter("query_cache_requests_total", "Elasticsearch search result cache lookups by result", ("route", "result"))
+)
+SEARCH_PHASES = registry.register(
+    Counter(
+        "search_phase_total",
+        "Text searches answered by the exact phase or sent on to the fuzzy one",
+        ("route", "outcome"),
+    )
+)
+LOCAL_CACHE = registry.register(Gauge("local_cache", "In-process cache tier state", ("stat",)))
+ES_LIMITER = registry.register(Gauge("es_limiter", "Adaptive Elasticsearch concurrency limiter state", ("stat",)))
+ES_LIMITER_REJECTED = registry.register(
+    Counter("es_limiter_rejected_total", "Elasticsearch calls shed by the concurrency limiter", ("reason",))
+)
+ES_BREAKER = registry.register(
+    Gauge("es_breaker_state", "Elasticsearch circuit breaker state (1 for the current one)", ("state",))
+)
+ES_BREAKER_REJECTED = registry.register(
+    Counter("es_breaker_rejected_total", "Elasticsearch calls failed fast by the open circuit breaker")
+)
+ES_MSEARCH_BATCH = registry.register(
+    Histogram(
+        "es_msearch_batch_size", "Searches sent to Elasticsearch per request", buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+    )
+)
+ES_HEDGED = registry.register(
+    Counter("es_hedged_requests_total", "Hedged Elasticsearch reads sent and won by the hedge", ("stage", "outcome"))
+)
+CACHE_INVALIDATIONS = registry.register(
+    Counter("cache_invalidations_total", "Cache keys evicted by change notifications", ("namespace",))
+)
+CACHE_CODEC_BYTES = registry.register(
+    Counter("cache_codec_bytes_total", "Cache payload bytes before (raw) and after (stored) encoding", ("kind",))
+)
+CACHE_COMPRESSION_RATIO = registry.register(
+    Gauge("cache_compression_ratio", "Raw to stored size ratio of cache payloads written by this worker")
+)
+CACHE_COMPRESSION_RATIO.set_function(
+    lambda: CACHE_CODEC_BYTES.value(kind="raw") / (CACHE_CODEC_BYTES.value(kind="stored") or 1)
+)
+
+
+def observe_stage(stage: str):
+    return STAGE_LATENCY.time(route=current_route.get(), stage=stage)
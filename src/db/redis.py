@@ -1,12 +1,16 @@
-from functools import lru_cache
-
 from aioredis import Redis
 
-from src.services.base_cache import RedisCache
+from src.core.metrics import LOCAL_CACHE
+from src.services.base_cache import BaseCache, LocalCache, RedisCache, TieredCache
+from src.services.codecs import get_codec
 
 redis: Redis = None
+local_cache = LocalCache()
+codec = get_codec()
+
+for stat in ("items", "bytes", "hits", "misses", "evictions"):
+    LOCAL_CACHE.set_function(lambda stat=stat: local_cache.stats()[stat], stat=stat)
 
 
-@lru_cache()
-async def get_redis() -> RedisCache:
-    return RedisCache(redis)
+async def get_redis() -> BaseCache:
+    return TieredCache(local_cache, RedisCache(redis, codec))
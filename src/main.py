@@ -4,13 +4,17 @@ from logging import config as logging_config
 import aioredis
 import uvicorn as uvicorn
 from elasticsearch import AsyncElasticsearch
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
 
+from src.api import metrics
 from src.core import config
 from src.core.logger import LOGGING
 from src.db import elastic, redis
 from src.routes import api_router
+from src.services import genre_catalogue, invalidation, suggest, warmup
+from src.services.budget import BudgetExceededError
+from src.services.limiter import OverloadedError
 
 app = FastAPI(
     title=config.PROJECT_NAME,
@@ -22,20 +26,55 @@ app = FastAPI(
 )
 
 
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError) -> ORJSONResponse:
+    # Быстрый отказ вместо ожидания в очереди к перегруженному Elasticsearch
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "service overloaded, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(BudgetExceededError)
+async def budget_exceeded_handler(request: Request, exc: BudgetExceededError) -> ORJSONResponse:
+    return ORJSONResponse(status_code=exc.status_code, content={"detail": "request deadline exceeded"})
+
+
 @app.on_event("startup")
 async def startup():
     logging_config.dictConfig(LOGGING)
     redis.redis = await aioredis.create_redis_pool((config.REDIS_HOST, config.REDIS_PORT), minsize=10, maxsize=20)
-    elastic.es = AsyncElasticsearch(hosts=[f"{config.ELASTIC_HOST}:{config.ELASTIC_PORT}"])
+    elastic.es = AsyncElasticsearch(
+        hosts=[f"{config.ELASTIC_HOST}:{config.ELASTIC_PORT}"], timeout=config.ES_REQUEST_TIMEOUT
+    )
+    if config.CACHE_INVALIDATION_ENABLED:
+        invalidation.start_listener()
+    if config.GENRE_CATALOGUE_ENABLED:
+        await genre_catalogue.start_refresh()
+    if config.SUGGEST_INDEX_ENABLED:
+        suggest.start_refresh()
+    if config.WARMUP_ENABLED:
+        await warmup.start_warmup()
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await redis.redis.close()
+    if config.WARMUP_ENABLED:
+        await warmup.stop_warmup()
+    if config.CACHE_INVALIDATION_ENABLED:
+        await invalidation.stop_listener()
+    if config.SUGGEST_INDEX_ENABLED:
+        suggest.stop_refresh()
+    if config.GENRE_CATALOGUE_ENABLED:
+        genre_catalogue.stop_refresh()
+    redis.redis.close()
+    await redis.redis.wait_closed()
     await elastic.es.close()
 
 
 app.include_router(api_router, prefix=config.API_V1_PREFIX)
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     uvicorn.run(
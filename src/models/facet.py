@@ -0,0 +1,36 @@
+import orjson
+from pydantic import BaseModel
+
+from src.utils import orjson_dumps
+
+
+class FacetBucket(BaseModel):
+    value: str
+    count: int
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
+
+
+class RatingBucket(BaseModel):
+    # Нижняя граница интервала рейтинга
+    value: float
+    count: int
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
+
+
+class FilmFacets(BaseModel):
+    total: int
+    genre: list[FacetBucket]
+    type: list[FacetBucket]
+    certificate: list[FacetBucket]
+    rating: list[RatingBucket]
+    year: list[FacetBucket]
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
@@ -32,3 +32,13 @@ class Film(BaseModel):
     class Config:
         json_loads = orjson.loads
         json_dumps = orjson_dumps
+
+
+class FilmShort(BaseModel):
+    id: str
+    title: str
+    imdb_rating: Optional[float] = None
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
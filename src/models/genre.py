@@ -15,3 +15,12 @@ class Genre(BaseModel):
     class Config:
         json_loads = orjson.loads
         json_dumps = orjson_dumps
+
+
+class GenreShort(BaseModel):
+    id: str
+    genre: str
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
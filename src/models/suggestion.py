@@ -0,0 +1,21 @@
+from enum import Enum
+
+import orjson
+from pydantic import BaseModel
+
+from src.utils import orjson_dumps
+
+
+class SuggestionKind(str, Enum):
+    FILM = "film"
+    PERSON = "person"
+
+
+class Suggestion(BaseModel):
+    id: str
+    text: str
+    kind: SuggestionKind
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
@@ -1,19 +1,245 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, Type
 
-from elasticsearch import AsyncElasticsearch
+import orjson
+from elasticsearch import AsyncElasticsearch, ConnectionTimeout, NotFoundError
+from pydantic import BaseModel
+
+from src.core.config import (
+    CURSOR_PIT_KEEP_ALIVE,
+    CURSOR_USE_PIT,
+    EXPORT_BATCH_SIZE,
+    QUERY_CACHE_ENABLED,
+    QUERY_CACHE_TTL,
+    SEARCH_EXACT_MIN_HITS,
+)
+from src.core.metrics import QUERY_CACHE_REQUESTS, SEARCH_PHASES, current_route, observe_stage
+from src.db.redis import get_redis
+from src.services.base_cache import BaseCache
+from src.services.breaker import es_breaker
+from src.services.budget import BudgetExceededError, remaining, request_params, shard_timeout
+from src.services.cache_keys import cache_keys
+from src.services.hedging import es_hedger
+from src.services.invalidation import tag_name
+from src.services.limiter import es_limiter
+from src.services.msearch import es_batcher
+from src.services.pagination import Cursor, sort_signature, with_tiebreaker
+from src.services.single_flight import SingleFlight
+
+
+def result_from_doc(doc: dict) -> dict:
+    return {"total": doc["hits"]["total"]["value"], "hits": doc["hits"]["hits"]}
+
+
+def exact_phase_wins(total: int) -> bool:
+    # Хватит ли точных совпадений, чтобы не запускать нечёткий запрос
+    outcome = "exact" if total >= SEARCH_EXACT_MIN_HITS else "fuzzy" if total else "fuzzy_empty"
+    SEARCH_PHASES.inc(route=current_route.get(), outcome=outcome)
+    return outcome == "exact"
+
+
+# Одинаковые поиски, пришедшие одновременно, ждут один ответ Elasticsearch
+query_flight = SingleFlight()
 
 
 class BaseService(ABC):
+    index: str
+    # Пространство имён кеша: по нему сбрасываются результаты поиска при изменении сущностей
+    namespace: str
+    model: Type[BaseModel]
+
     def __init__(self, elastic: AsyncElasticsearch):
         self.elastic = elastic
 
+    @asynccontextmanager
+    async def es_call(self, stage: str):
+        # Порядок важен: при разомкнутом предохранителе отказываем сразу, не занимая место в очереди лимитера
+        async with es_breaker.call(), es_limiter.slot():
+            with observe_stage(stage):
+                yield
+
+    async def es_read(self, stage: str, request: Callable[[Optional[float]], Awaitable[dict]]) -> dict:
+        # Идемпотентное чтение: таймаут из остатка бюджета запроса, на долгий ответ - дублирующий запрос
+        async def attempt() -> dict:
+            left = None
+            try:
+                async with self.es_call(stage):
+                    # Остаток бюджета - после ожидания в очереди лимитера, иначе вызов переживёт срок запроса
+                    left = remaining()
+                    return await request(left)
+            except ConnectionTimeout as exc:
+                if left is None:
+                    raise
+                raise BudgetExceededError() from exc
+
+        return await es_hedger.run(stage, attempt)
+
+    async def es_search(self, body: Optional[dict] = None) -> dict:
+        # Поиск внутри point-in-time идёт без указания индекса
+        index = None if body and "pit" in body else self.index
+
+        async def request(left: Optional[float]) -> dict:
+            if left is not None:
+                body_with_timeout = {**(body or {}), "timeout": shard_timeout(left)}
+            else:
+                body_with_timeout = body
+            if index is None:
+                # Point-in-time в _msearch не передаётся: такие поиски идут по одному
+                doc = await self.elastic.search(body=body_with_timeout, **request_params(left))
+            else:
+                doc = await es_batcher.search(self.elastic, index, body_with_timeout, left)
+            if doc.get("timed_out"):
+                # Часть шардов не уложилась в бюджет: неполную выдачу не отдаём и не кешируем
+                raise BudgetExceededError()
+            return doc
+
+        return await self.es_read("es_search", request)
+
+    async def es_get(self, entity_id: str) -> Optional[dict]:
+        try:
+            return await self.es_read(
+                "es_get", lambda left: self.elastic.get(self.index, entity_id, **request_params(left))
+            )
+        except NotFoundError:
+            return None
+
+    async def es_mget(self, entity_ids: list[str]) -> dict:
+        return await self.es_read(
+            "es_mget",
+            lambda left: self.elastic.mget(index=self.index, body={"ids": entity_ids}, **request_params(left)),
+        )
+
+    async def search_result(self, es_query: Optional[dict] = None) -> dict:
+        # Сырые hits и число совпадений кешируются по нормализованному телу поиска: одинаковый запрос
+        # из разных эндпоинтов и с разными проекциями уходит в Elasticsearch один раз
+        if not QUERY_CACHE_ENABLED:
+            return result_from_doc(await self.es_search(es_query))
+
+        cache = await get_redis()
+        key = await cache_keys.query_key(cache, self.namespace, self.index, es_query)
+        data = await cache.get_from_cache(key)
+        QUERY_CACHE_REQUESTS.inc(route=current_route.get(), result="miss" if data is None else "hit")
+        if data is None:
+            data = await query_flight.do(key, lambda: self.load_result(cache, key, es_query))
+        return orjson.loads(data)
+
+    async def load_result(self, cache: BaseCache, key: str, es_query: Optional[dict]) -> bytes:
+        result = result_from_doc(await self.es_search(es_query))
+        data = orjson.dumps(result)
+        # Правка любого найденного документа сбрасывает запись через его тег
+        await cache.cache(key, data, expire=QUERY_CACHE_TTL)
+        tags = [tag_name(self.namespace, hit["_id"]) for hit in result["hits"]]
+        await cache.tag_many({key: tags}, expire=QUERY_CACHE_TTL)
+        return data
+
+    async def search_hits(self, es_query: Optional[dict] = None, fuzzy_query: Optional[dict] = None) -> list[dict]:
+        # С fuzzy_query поиск двухфазный: сначала дешёвый точный query из es_query (совпадения считаем
+        # только до порога), нечёткий - если точных совпадений меньше порога
+        if fuzzy_query is None:
+            return (await self.search_result(es_query))["hits"]
+
+        result = await self.search_result({**es_query, "track_total_hits": SEARCH_EXACT_MIN_HITS})
+        if exact_phase_wins(result["total"]):
+            return result["hits"]
+        return (await self.search_result({**es_query, "query": fuzzy_query}))["hits"]
+
+    async def es_open_pit(self) -> str:
+        async with self.es_call("es_open_pit"):
+            return (await self.elastic.open_point_in_time(index=self.index, keep_alive=CURSOR_PIT_KEEP_ALIVE))["id"]
+
+    async def es_close_pit(self, pit_id: str):
+        async with self.es_call("es_close_pit"):
+            await self.elastic.close_point_in_time(body={"id": pit_id})
+
+    def build_models(self, sources: list[dict], projection: Optional[Type[BaseModel]] = None) -> list[BaseModel]:
+        with observe_stage("model_build"):
+            if projection is not None:
+                # Документы из собственного индекса уже соответствуют схеме: проекции строим без валидации
+                return [projection.construct(**source) for source in sources]
+            return [self.model(**source) for source in sources]
+
+    async def hydrate(self, sources: list[dict]) -> list[dict]:
+        # Подстановка вложенных сущностей для индексов, которые хранят только их id
+        return sources
+
+    async def get_by_ids(self, entity_ids: list[str]) -> dict[str, BaseModel]:
+        if not entity_ids:
+            return {}
+        hits = [hit for hit in (await self.es_mget(entity_ids))["docs"] if hit.get("found")]
+        sources = await self.hydrate([hit["_source"] for hit in hits])
+        return dict(zip((hit["_id"] for hit in hits), self.build_models(sources)))
+
+    async def get_page(
+        self, es_query: dict, cursor: str, projection: Optional[Type[BaseModel]] = None
+    ) -> tuple[list[BaseModel], Optional[str]]:
+        # Курсорная пагинация: стоимость страницы не зависит от глубины, from не используется
+        cursor = Cursor.decode(cursor)
+        body = {key: value for key, value in es_query.items() if key != "from"}
+        body["sort"] = with_tiebreaker(body["sort"])
+        sort = sort_signature(body["sort"])
+        cursor.check_sort(sort)
+        if cursor.search_after is not None:
+            body["search_after"] = cursor.search_after
+
+        if CURSOR_USE_PIT:
+            pit_id = cursor.pit_id
+            if pit_id is None:
+                pit_id = await self.es_open_pit()
+            body["pit"] = {"id": pit_id, "keep_alive": CURSOR_PIT_KEEP_ALIVE}
+
+        doc = await self.es_search(body)
+        hits = doc["hits"]["hits"]
+        pit_id = doc.get("pit_id")
+
+        # Пустая страница (в том числе при size=0) - конец выборки: продолжать курсор не от чего
+        if not hits or len(hits) < body["size"]:
+            if pit_id is not None:
+                await self.es_close_pit(pit_id)
+            return self.build_models([hit["_source"] for hit in hits], projection), None
+
+        return (
+            self.build_models([hit["_source"] for hit in hits], projection),
+            Cursor(hits[-1]["sort"], pit_id, sort).encode(),
+        )
+
+    async def iter_sources(self, source: list[str], batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[list[dict]]:
+        # Обход всего индекса пачками через point-in-time и search_after по _shard_doc
+        pit_id = await self.es_open_pit()
+        search_after = None
+        try:
+            while True:
+                body = {
+                    "size": batch_size,
+                    "sort": [{"_shard_doc": "asc"}],
+                    "_source": source,
+                    "pit": {"id": pit_id, "keep_alive": CURSOR_PIT_KEEP_ALIVE},
+                }
+                if search_after is not None:
+                    body["search_after"] = search_after
+
+                doc = await self.es_search(body)
+                hits = doc["hits"]["hits"]
+                pit_id = doc.get("pit_id", pit_id)
+                if hits:
+                    yield [hit["_source"] for hit in hits]
+                if len(hits) < batch_size:
+                    break
+                search_after = hits[-1]["sort"]
+        finally:
+            await self.es_close_pit(pit_id)
+
     @abstractmethod
     async def get_by_id(self, entity_id: str):
         pass
 
     @abstractmethod
-    async def get_from_elastic_many(self, es_query: Optional[dict] = None):
+    async def get_from_elastic_many(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ):
         pass
 
     @abstractmethod
@@ -21,5 +247,10 @@ class BaseService(ABC):
         pass
 
     @abstractmethod
-    async def get_list(self, es_query: Optional[dict] = None):
+    async def get_list(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ):
         pass
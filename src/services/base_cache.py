@@ -1,30 +1,290 @@
+import time
+import uuid
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Optional, Union
 
 from aioredis import Redis
 
-from src.core.config import CACHE_TTL
+from src.core.config import CACHE_LOCK_TTL, CACHE_TTL, LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_MAX_ITEMS, LOCAL_CACHE_TTL
+from src.core.metrics import observe_stage
+from src.services.codecs import CacheCodec, get_codec
+
+# Снимаем блокировку, только если она всё ещё наша
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
 
 
 class BaseCache(ABC):
     @abstractmethod
-    async def cache(self, key: str, data: Union[dict, list]):
+    async def cache(self, key: str, data: Union[dict, list], expire: int = CACHE_TTL):
         pass
 
     @abstractmethod
     async def get_from_cache(self, key: str):
         pass
 
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [await self.get_from_cache(key) for key in keys]
+
+    async def cache_many(self, items: dict[str, bytes], expire: int = CACHE_TTL):
+        for key, data in items.items():
+            await self.cache(key, data, expire)
+
+    async def cache_fallback(self, items: dict[str, bytes], expire: int):
+        # Долгоживущие резервные копии ответов на случай недоступности Elasticsearch
+        await self.cache_many(items, expire)
+
+    async def get_fallback(self, key: str) -> Optional[bytes]:
+        return await self.get_from_cache(key)
+
+    @abstractmethod
+    async def delete(self, keys: list[str]):
+        pass
+
+    async def tag_many(self, tagged: dict[str, list[str]], expire: int = CACHE_TTL):
+        pass
+
+    async def get_tagged(self, tags: list[str]) -> list[str]:
+        return []
+
+    @abstractmethod
+    async def get_counter(self, key: str) -> int:
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        pass
+
+    async def acquire_lock(self, key: str, ttl: int = CACHE_LOCK_TTL) -> Optional[str]:
+        return ""
+
+    async def release_lock(self, key: str, token: str):
+        pass
+
+    async def is_locked(self, key: str) -> bool:
+        return False
+
 
 class RedisCache(BaseCache):
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, codec: Optional[CacheCodec] = None):
         self.redis = redis
+        self.codec = codec or get_codec()
+
+    async def cache(self, key: str, data: Union[str, bytes], expire: int = CACHE_TTL):
+        if isinstance(data, str):
+            data = data.encode()
+        data = self.codec.encode(data)
+        with observe_stage("cache_set"):
+            await self.redis.set(key, data, expire=expire)
+
+    async def get_from_cache(self, key: str) -> Optional[bytes]:
+        with observe_stage("cache_get"):
+            data = await self.redis.get(key)
+        return self.codec.decode(data)
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        if not keys:
+            return []
+        with observe_stage("cache_get"):
+            found = await self.redis.mget(*keys)
+        return [self.codec.decode(data) for data in found]
+
+    async def cache_many(self, items: dict[str, bytes], expire: int = CACHE_TTL):
+        if not items:
+            return
+        pipe = self.redis.pipeline()
+        for key, data in items.items():
+            pipe.set(key, self.codec.encode(data), expire=expire)
+        with observe_stage("cache_set"):
+            await pipe.execute()
+
+    async def delete(self, keys: list[str]):
+        if keys:
+            await self.redis.delete(*keys)
+
+    async def tag_many(self, tagged: dict[str, list[str]], expire: int = CACHE_TTL):
+        # Множество tag:<тег> хранит ключи кеша, в которые попала помеченная сущность
+        if not any(tagged.values()):
+            return
+        pipe = self.redis.pipeline()
+        for key, tags in tagged.items():
+            for tag in tags:
+                pipe.sadd(f"tag:{tag}", key)
+                pipe.expire(f"tag:{tag}", expire)
+        await pipe.execute()
+
+    async def get_tagged(self, tags: list[str]) -> list[str]:
+        if not tags:
+            return []
+        pipe = self.redis.pipeline()
+        for tag in tags:
+            pipe.smembers(f"tag:{tag}")
+        members = await pipe.execute()
+        return list({key.decode() if isinstance(key, bytes) else key for keys in members for key in keys})
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self.redis.get(key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self.redis.incr(key)
+
+    async def acquire_lock(self, key: str, ttl: int = CACHE_LOCK_TTL) -> Optional[str]:
+        token = uuid.uuid4().hex
+        acquired = await self.redis.set(f"lock:{key}", token, expire=ttl, exist=Redis.SET_IF_NOT_EXIST)
+        return token if acquired else None
+
+    async def release_lock(self, key: str, token: str):
+        await self.redis.eval(RELEASE_LOCK_SCRIPT, keys=[f"lock:{key}"], args=[token])
 
-    async def cache(self, key: str, data: Union[dict, bytes]):
-        await self.redis.set(key, data, expire=CACHE_TTL)
+    async def is_locked(self, key: str) -> bool:
+        return bool(await self.redis.exists(f"lock:{key}"))
+
+
+class LocalCache(BaseCache):
+    def __init__(
+        self,
+        ttl: float = LOCAL_CACHE_TTL,
+        max_items: int = LOCAL_CACHE_MAX_ITEMS,
+        max_bytes: int = LOCAL_CACHE_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    async def cache(self, key: str, data: Union[str, bytes], expire: int = CACHE_TTL):
+        if isinstance(data, str):
+            data = data.encode()
+        if len(data) > self.max_bytes:
+            return
+
+        self._pop(key)
+        self._entries[key] = (time.monotonic() + min(self.ttl, expire), data)
+        self.size += len(data)
+        while len(self._entries) > self.max_items or self.size > self.max_bytes:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
 
     async def get_from_cache(self, key: str) -> Optional[bytes]:
-        data = await self.redis.get(key)
-        if not data:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
             return None
+
+        expires_at, data = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
         return data
+
+    async def delete(self, keys: list[str]):
+        for key in keys:
+            self._pop(key)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class TieredCache(BaseCache):
+    # L1 в памяти процесса перед Redis: горячие ключи не ходят по сети
+    def __init__(self, local: LocalCache, remote: BaseCache):
+        self.local = local
+        self.remote = remote
+
+    async def cache(self, key: str, data: Union[str, bytes], expire: int = CACHE_TTL):
+        await self.remote.cache(key, data, expire)
+        await self.local.cache(key, data, expire)
+
+    async def get_from_cache(self, key: str) -> Optional[bytes]:
+        data = await self.local.get_from_cache(key)
+        if data is not None:
+            return data
+
+        data = await self.remote.get_from_cache(key)
+        if data is not None:
+            await self.local.cache(key, data)
+        return data
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        found = await self.local.get_many(keys)
+        missing = [key for key, data in zip(keys, found) if data is None]
+        if not missing:
+            return found
+
+        remote = dict(zip(missing, await self.remote.get_many(missing)))
+        for key, data in remote.items():
+            if data is not None:
+                await self.local.cache(key, data)
+        return [data if data is not None else remote[key] for key, data in zip(keys, found)]
+
+    async def cache_many(self, items: dict[str, bytes], expire: int = CACHE_TTL):
+        await self.remote.cache_many(items, expire)
+        await self.local.cache_many(items, expire)
+
+    async def cache_fallback(self, items: dict[str, bytes], expire: int):
+        # Резервные копии читаются редко, держать их в памяти процесса незачем
+        await self.remote.cache_fallback(items, expire)
+
+    async def get_fallback(self, key: str) -> Optional[bytes]:
+        return await self.remote.get_fallback(key)
+
+    async def delete(self, keys: list[str]):
+        await self.remote.delete(keys)
+        await self.local.delete(keys)
+
+    async def tag_many(self, tagged: dict[str, list[str]], expire: int = CACHE_TTL):
+        await self.remote.tag_many(tagged, expire)
+
+    async def get_tagged(self, tags: list[str]) -> list[str]:
+        return await self.remote.get_tagged(tags)
+
+    async def get_counter(self, key: str) -> int:
+        return await self.remote.get_counter(key)
+
+    async def incr(self, key: str) -> int:
+        return await self.remote.incr(key)
+
+    async def acquire_lock(self, key: str, ttl: int = CACHE_LOCK_TTL) -> Optional[str]:
+        return await self.remote.acquire_lock(key, ttl)
+
+    async def release_lock(self, key: str, token: str):
+        await self.remote.release_lock(key, token)
+
+    async def is_locked(self, key: str) -> bool:
+        return await self.remote.is_locked(key)
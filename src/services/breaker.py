@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from elasticsearch import ConnectionError, TransportError
+
+from src.core.config import (
+    ES_BREAKER_ENABLED,
+    ES_BREAKER_FAILURE_RATE,
+    ES_BREAKER_HALF_OPEN_CALLS,
+    ES_BREAKER_MIN_CALLS,
+    ES_BREAKER_RESET_TIMEOUT,
+    ES_BREAKER_WINDOW,
+)
+from src.core.metrics import ES_BREAKER, ES_BREAKER_REJECTED
+from src.services.budget import BudgetExceededError
+from src.services.limiter import OverloadedError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(OverloadedError):
+    # Отвечаем так же, как при перегрузке: 503 с Retry-After
+    pass
+
+
+# Ошибки источника данных, при которых кешированный эндпоинт отдаёт резервную копию
+BACKEND_ERRORS = (OverloadedError, BudgetExceededError, TransportError, asyncio.TimeoutError)
+
+
+def is_failure(exc: BaseException) -> bool:
+    # Сбоем считаются недоступность и ошибки кластера; 404, ошибки запроса и наш собственный отказ - нет
+    if isinstance(exc, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    return (
+        isinstance(exc, TransportError)
+        and isinstance(exc.status_code, int)
+        and exc.status_code in (429, 500, 502, 503, 504)
+    )
+
+
+class CircuitBreaker:
+    # closed: вызовы идут, исходы копятся в скользящем окне; доля сбоев выше порога - переходим в open.
+    # open: вызовы сразу получают отказ; через reset_timeout - half_open.
+    # half_open: пропускаем несколько пробных вызовов; успех замыкает цепь, сбой снова размыкает
+    def __init__(
+        self,
+        failure_rate: float = ES_BREAKER_FAILURE_RATE,
+        min_calls: int = ES_BREAKER_MIN_CALLS,
+        window: float = ES_BREAKER_WINDOW,
+        reset_timeout: float = ES_BREAKER_RESET_TIMEOUT,
+        half_open_calls: int = ES_BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._failures = 0
+
+    def _close(self):
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+    def _before_call(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+
+        ES_BREAKER_REJECTED.inc()
+        remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+        raise CircuitOpenError(max(1, math.ceil(remaining)))
+
+    def _record(self, failed: bool, probe: bool):
+        if probe:
+            self._probes = max(self._probes - 1, 0)
+            if failed:
+                self._open()
+            elif self._state == HALF_OPEN:
+                self._close()
+            return
+        if self._state != CLOSED:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._failures -= self._outcomes.popleft()[1]
+        if len(self._outcomes) >= self.min_calls and self._failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    @asynccontextmanager
+    async def call(self):
+        probe = self._before_call()
+        try:
+            yield
+        except asyncio.CancelledError:
+            if probe:
+                self._probes = max(self._probes - 1, 0)
+            raise
+        except BaseException as exc:
+            self._record(is_failure(exc), probe)
+            raise
+        else:
+            self._record(False, probe)
+
+
+class NoBreaker:
+    @asynccontextmanager
+    async def call(self):
+        yield
+
+
+es_breaker = CircuitBreaker() if ES_BREAKER_ENABLED else NoBreaker()
+
+if ES_BREAKER_ENABLED:
+    for breaker_state in (CLOSED, HALF_OPEN, OPEN):
+        ES_BREAKER.set_function(lambda state=breaker_state: int(es_breaker.state == state), state=breaker_state)
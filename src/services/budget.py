@@ -0,0 +1,52 @@
+import time
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import Awaitable, Callable, Optional
+
+from src.core.config import ES_SHARD_TIMEOUT_SHARE
+
+# Момент (time.monotonic), к которому запрос к API должен получить все ответы Elasticsearch
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class BudgetExceededError(Exception):
+    status_code = HTTPStatus.GATEWAY_TIMEOUT
+
+    def __init__(self):
+        super().__init__("latency budget exceeded")
+
+
+def latency_budget(seconds: float) -> Callable:
+    # Бюджет эндпоинта; декоратор ставится над @cached, чтобы атрибут достался функции, которую видит роутер
+    def decorator(func: Callable) -> Callable:
+        func.latency_budget = seconds
+        return func
+
+    return decorator
+
+
+def remaining() -> Optional[float]:
+    # Вне запроса (прогрев, фоновые задачи) бюджета нет - действует таймаут клиента Elasticsearch
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise BudgetExceededError()
+    return left
+
+
+async def without_budget(coro: Awaitable):
+    # Фоновая задача переживает запрос: его срок на неё не распространяется. Задача работает в копии
+    # контекста, поэтому сброс не трогает сам запрос
+    request_deadline.set(None)
+    return await coro
+
+
+def shard_timeout(left: float) -> str:
+    # Шарды останавливают поиск раньше транспорта, чтобы ответ успел вернуться, а соединение не рвалось
+    return f"{max(1, int(left * ES_SHARD_TIMEOUT_SHARE * 1000))}ms"
+
+
+def request_params(left: Optional[float]) -> dict:
+    return {} if left is None else {"request_timeout": left}
@@ -0,0 +1,42 @@
+import struct
+import time
+from typing import Optional
+
+import orjson
+
+# Маркер конверта; значения без него записаны старым форматом и считаются свежими
+ENTRY_MAGIC = b"\xce"
+HEADER_LENGTH = struct.Struct("!I")
+
+
+class CacheEntry:
+    __slots__ = ("data", "fresh_until", "headers")
+
+    def __init__(self, data: bytes, fresh_until: float, headers: Optional[dict] = None):
+        self.data = data
+        self.fresh_until = fresh_until
+        self.headers = headers or {}
+
+    @classmethod
+    def create(cls, data: bytes, soft_ttl: float, headers: Optional[dict] = None) -> "CacheEntry":
+        return cls(data, time.time() + soft_ttl, headers)
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() >= self.fresh_until
+
+    def pack(self) -> bytes:
+        header = orjson.dumps({"f": self.fresh_until, "h": self.headers})
+        return ENTRY_MAGIC + HEADER_LENGTH.pack(len(header)) + header + self.data
+
+    @classmethod
+    def unpack(cls, raw: Optional[bytes]) -> Optional["CacheEntry"]:
+        if raw is None:
+            return None
+        if not raw.startswith(ENTRY_MAGIC):
+            return cls(raw, float("inf"))
+
+        offset = len(ENTRY_MAGIC) + HEADER_LENGTH.size
+        (header_length,) = HEADER_LENGTH.unpack_from(raw, len(ENTRY_MAGIC))
+        header = orjson.loads(raw[offset : offset + header_length])
+        return cls(raw[offset + header_length :], header["f"], header.get("h"))
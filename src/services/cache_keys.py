@@ -0,0 +1,100 @@
+import hashlib
+import time
+from enum import Enum
+from typing import Optional
+
+import orjson
+
+from src.core.config import API_V1_PREFIX, CACHE_GENERATION_TTL
+from src.services.base_cache import BaseCache
+
+API_VERSION = API_V1_PREFIX.strip("/")
+
+
+def normalize_params(params: dict) -> dict:
+    # В ключ попадают только скалярные параметры запроса: сервисы из Depends отбрасываем
+    normalized = {}
+    for name, value in params.items():
+        if isinstance(value, Enum):
+            value = value.value
+        if isinstance(value, str):
+            value = " ".join(value.split())
+        if isinstance(value, (list, tuple)):
+            # Повторяющиеся параметры запроса (?genre=a&genre=b)
+            value = [item.value if isinstance(item, Enum) else item for item in value]
+            if all(isinstance(item, (str, int, float, bool)) for item in value):
+                normalized[name] = value
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            normalized[name] = value
+    return normalized
+
+
+def sort_entry(entry) -> dict:
+    # "field" и {"field": "asc"} - та же сортировка, что {"field": {"order": "asc"}}; _score по умолчанию убывает
+    if isinstance(entry, str):
+        return {entry: {"order": "desc" if entry == "_score" else "asc"}}
+    return {field: value if isinstance(value, dict) else {"order": value} for field, value in entry.items()}
+
+
+def normalize_query(index: str, body: Optional[dict]) -> dict:
+    # Умолчания Elasticsearch подставляем явно, порядок полей _source на выдачу не влияет
+    normalized = {key: value for key, value in (body or {}).items() if value is not None}
+    normalized["index"] = index
+    normalized.setdefault("size", 10)
+    normalized.setdefault("from", 0)
+    if "sort" in normalized:
+        sort = normalized["sort"]
+        normalized["sort"] = [sort_entry(entry) for entry in (sort if isinstance(sort, list) else [sort])]
+    if isinstance(normalized.get("_source"), list):
+        normalized["_source"] = sorted(set(normalized["_source"]))
+    return normalized
+
+
+class CacheKeys:
+    def __init__(self, generation_ttl: float = CACHE_GENERATION_TTL):
+        self.generation_ttl = generation_ttl
+        self._generations: dict[str, tuple[float, int]] = {}
+
+    @staticmethod
+    def generation_key(namespace: str) -> str:
+        return f"generation:{namespace}"
+
+    async def generation(self, cache: BaseCache, namespace: str) -> int:
+        # Поколение держим в памяти процесса недолго, чтобы не ходить за ним в Redis на каждый запрос
+        now = time.monotonic()
+        memo = self._generations.get(namespace)
+        if memo is not None and memo[0] > now:
+            return memo[1]
+
+        value = await cache.get_counter(self.generation_key(namespace))
+        self._generations[namespace] = (now + self.generation_ttl, value)
+        return value
+
+    def forget(self, namespace: str):
+        self._generations.pop(namespace, None)
+
+    async def request_key(self, cache: BaseCache, namespace: str, route: str, params: dict) -> str:
+        request = {"version": API_VERSION, "route": route, "params": normalize_params(params)}
+        digest = hashlib.blake2b(orjson.dumps(request, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+        return f"{namespace}:g{await self.generation(cache, namespace)}:{digest}"
+
+    async def query_key(self, cache: BaseCache, namespace: str, index: str, body: Optional[dict]) -> str:
+        query = orjson.dumps(normalize_query(index, body), option=orjson.OPT_SORT_KEYS)
+        digest = hashlib.blake2b(query, digest_size=16).hexdigest()
+        return f"{namespace}:g{await self.generation(cache, namespace)}:query:{digest}"
+
+    async def entity_keys(self, cache: BaseCache, namespace: str, entity_ids: list[str]) -> list[str]:
+        generation = await self.generation(cache, namespace)
+        return [f"{namespace}:g{generation}:id:{entity_id}" for entity_id in entity_ids]
+
+    @staticmethod
+    def fallback_key(key: str) -> str:
+        # Резервная копия переживает смену поколения: при недоступном ES лучше старые данные, чем ошибка
+        namespace, _, rest = key.split(":", 2)
+        return f"fallback:{namespace}:{rest}"
+
+    async def entity_key(self, cache: BaseCache, namespace: str, entity_id: str) -> str:
+        return (await self.entity_keys(cache, namespace, [entity_id]))[0]
+
+
+cache_keys = CacheKeys()
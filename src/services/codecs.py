@@ -0,0 +1,132 @@
+import logging
+import zlib
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from src.core.config import CACHE_COMPRESSION, CACHE_COMPRESSION_LEVEL, CACHE_COMPRESSION_MIN_SIZE
+from src.core.metrics import CACHE_CODEC_BYTES, observe_stage
+from src.services.cache_entry import ENTRY_MAGIC
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - опциональная зависимость
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - опциональная зависимость
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+# Первые байты значений, записанных до появления кодеков: JSON или конверт CacheEntry
+LEGACY_PREFIXES = frozenset(b'[{"' + ENTRY_MAGIC)
+
+
+class Compressor(ABC):
+    # Первый байт сохранённого значения; по нему значение и декодируется
+    marker: bytes
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class Identity(Compressor):
+    marker = b"\x00"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class Zlib(Compressor):
+    marker = b"\x01"
+
+    def __init__(self, level: int = CACHE_COMPRESSION_LEVEL):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class Zstd(Compressor):
+    marker = b"\x02"
+
+    def __init__(self, level: int = CACHE_COMPRESSION_LEVEL):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self.decompressor.decompress(data)
+
+
+class Lz4(Compressor):
+    marker = b"\x03"
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+class CacheCodec:
+    def __init__(self, compressor: Compressor, min_size: int = CACHE_COMPRESSION_MIN_SIZE):
+        self.compressor = compressor
+        self.min_size = min_size
+        self.decoders = {codec.marker: codec for codec in available_compressors()}
+
+    def encode(self, data: bytes) -> bytes:
+        with observe_stage("cache_encode"):
+            if len(data) >= self.min_size:
+                encoded = self.compressor.marker + self.compressor.compress(data)
+            else:
+                encoded = Identity.marker + data
+        CACHE_CODEC_BYTES.inc(len(data), kind="raw")
+        CACHE_CODEC_BYTES.inc(len(encoded), kind="stored")
+        return encoded
+
+    def decode(self, data: Optional[bytes]) -> Optional[bytes]:
+        if not data:
+            return None
+        decoder = self.decoders.get(data[:1])
+        if decoder is None:
+            if data[0] in LEGACY_PREFIXES:
+                # Значение записано до появления кодеков
+                return data
+            # Сжато кодеком, которого нет в этом воркере (zstd/lz4 не установлены): считаем промахом
+            return None
+        with observe_stage("cache_decode"):
+            return decoder.decompress(data[1:])
+
+
+def available_compressors() -> list[Compressor]:
+    compressors = [Identity(), Zlib()]
+    if zstandard is not None:
+        compressors.append(Zstd())
+    if lz4_frame is not None:
+        compressors.append(Lz4())
+    return compressors
+
+
+def get_codec(name: str = CACHE_COMPRESSION) -> CacheCodec:
+    compressors = {"none": Identity, "zlib": Zlib, "zstd": Zstd, "lz4": Lz4}
+    if name not in compressors:
+        raise ValueError(f"unknown cache compression: {name}")
+    if (name == "zstd" and zstandard is None) or (name == "lz4" and lz4_frame is None):
+        logger.warning("%s is not installed, falling back to zlib for cache compression", name)
+        name = "zlib"
+    return CacheCodec(compressors[name]())
@@ -0,0 +1,54 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from src.services.background import run_in_background
+
+BatchFunction = Callable[[list[str]], Awaitable[dict[str, Any]]]
+
+# Загрузчики текущего запроса по имени; выставляется на время обработки запроса
+request_loaders: ContextVar[Optional[dict[str, "DataLoader"]]] = ContextVar("request_loaders", default=None)
+
+
+class DataLoader:
+    # Ключи, запрошенные до ближайшего переключения цикла событий, грузятся одним вызовом batch_fn.
+    # Результаты запоминаются до конца запроса: повторная ссылка на ту же сущность не идёт в хранилище
+    def __init__(self, batch_fn: BatchFunction):
+        self.batch_fn = batch_fn
+        self._futures: dict[str, asyncio.Future] = {}
+        self._queue: list[str] = []
+
+    def load(self, key: str) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is None:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+            if not self._queue:
+                run_in_background(self._dispatch())
+            self._queue.append(key)
+        return future
+
+    async def load_many(self, keys: list[str]) -> list:
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        try:
+            found = await self.batch_fn(keys)
+        except Exception as exc:
+            # Ошибку не запоминаем: следующий запрос этих ключей попробует снова
+            for key in keys:
+                self._futures.pop(key).set_exception(exc)
+            return
+        for key in keys:
+            self._futures[key].set_result(found.get(key))
+
+
+def get_loader(name: str, batch_fn: BatchFunction) -> DataLoader:
+    loaders = request_loaders.get()
+    if loaders is None:
+        # Вне запроса (прогрев, фоновые задачи) загрузчик живёт один вызов
+        return DataLoader(batch_fn)
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = DataLoader(batch_fn)
+    return loader
@@ -1,15 +1,114 @@
+import asyncio
 from functools import lru_cache
-from typing import Optional
+from typing import Optional, Type, Union
 
+import orjson
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
+from pydantic import BaseModel
 
+from src.core.config import FACETS_RATING_INTERVAL, FACETS_TERMS_SIZE
 from src.db.elastic import get_elastic
+from src.models.facet import FacetBucket, FilmFacets, RatingBucket
 from src.models.film import Film
-from src.services.base import BaseService
+from src.models.genre import Genre
+from src.models.person import Person
+from src.models.suggestion import SuggestionKind
+from src.services import genre_catalogue
+from src.services.base import BaseService, exact_phase_wins
+from src.services.dataloader import get_loader
+from src.services.genre import get_genre_service
+from src.services.person import get_person_service
+from src.utils import cached_entities
+
+
+def required_fields(model: Type[BaseModel]) -> frozenset:
+    return frozenset(name for name, field in model.__fields__.items() if field.required)
+
+
+# Вложенные сущности фильма: поле документа и обязательные поля модели
+NESTED_FIELDS = {"genres": required_fields(Genre), "people": required_fields(Person)}
+
+
+def reference_id(item: Union[str, dict], required: frozenset) -> Optional[str]:
+    # Ссылкой считается голый id или объект без обязательных полей модели
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict) and "id" in item and not required <= item.keys():
+        return str(item["id"])
+    return None
+
+
+async def load_cached(namespace: str, entity_ids: list[str], fetch) -> dict[str, dict]:
+    found = await cached_entities(namespace, entity_ids, fetch)
+    return {entity_id: orjson.loads(data) for entity_id, data in found.items()}
+
+
+FACET_AGGS = {
+    "genre": {"terms": {"field": "genre", "size": FACETS_TERMS_SIZE}},
+    "type": {"terms": {"field": "type", "size": FACETS_TERMS_SIZE}},
+    "certificate": {"terms": {"field": "certificate", "size": FACETS_TERMS_SIZE}},
+    "rating": {"histogram": {"field": "imdb_rating", "interval": FACETS_RATING_INTERVAL, "min_doc_count": 1}},
+    "year": {
+        "date_histogram": {"field": "creation_date", "calendar_interval": "year", "format": "yyyy", "min_doc_count": 1}
+    },
+}
+
+
+def term_buckets(aggregation: dict) -> list[FacetBucket]:
+    return [
+        FacetBucket(value=str(bucket.get("key_as_string", bucket["key"])), count=bucket["doc_count"])
+        for bucket in aggregation["buckets"]
+    ]
 
 
 class FilmService(BaseService):
+    index = "movies"
+    namespace = "films"
+    model = Film
+
+    async def load_genres(self, genre_ids: list[str]) -> dict:
+        catalogue = genre_catalogue.catalogue
+        if catalogue is not None:
+            return await catalogue.get_by_ids(genre_ids)
+        return await load_cached("genres", genre_ids, get_genre_service(self.elastic).get_by_ids)
+
+    async def load_people(self, person_ids: list[str]) -> dict:
+        return await load_cached("people", person_ids, get_person_service(self.elastic).get_by_ids)
+
+    async def hydrate(self, sources: list[dict]) -> list[dict]:
+        # Все ссылки на жанры и персоны из ответа собираются вместе и грузятся через загрузчики запроса:
+        # одним MGET из кеша и одним mget в ES на тип сущности, сколько бы фильмов ни было в ответе
+        references = {field: {} for field in NESTED_FIELDS}
+        for source in sources:
+            for field, required in NESTED_FIELDS.items():
+                for item in source.get(field) or []:
+                    entity_id = reference_id(item, required)
+                    if entity_id is not None:
+                        references[field][entity_id] = None
+        fields = [field for field, entity_ids in references.items() if entity_ids]
+        if not fields:
+            return sources
+
+        batch_functions = {"genres": self.load_genres, "people": self.load_people}
+        loaded = await asyncio.gather(
+            *(get_loader(field, batch_functions[field]).load_many(list(references[field])) for field in fields)
+        )
+        for field, values in zip(fields, loaded):
+            resolved = dict(zip(references[field], values))
+            required = NESTED_FIELDS[field]
+            for source in sources:
+                items = []
+                for item in source.get(field) or []:
+                    entity_id = reference_id(item, required)
+                    if entity_id is None:
+                        items.append(item)
+                    elif resolved[entity_id] is not None:
+                        # Удалённые сущности из ответа пропадают
+                        items.append(resolved[entity_id])
+                source[field] = items
+        return sources
+
     async def get_by_id(self, film_id: str) -> Optional[Film]:
         film = await self.get_from_elastic_scalar(film_id)
         if not film:
@@ -17,32 +116,67 @@ class FilmService(BaseService):
 
         return film
 
-    async def get_list(self, es_query: Optional[dict] = None) -> list[Film]:
-        films = await self.get_from_elastic_many(es_query)
+    async def get_list(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ) -> list[BaseModel]:
+        films = await self.get_from_elastic_many(es_query, projection, fuzzy_query)
         if films is None:
             return []
 
         return films
 
+    async def suggest(self, prefix: str, limit: int) -> list[dict]:
+        # Запасной путь, пока не загружен индекс подсказок в памяти: префикс по словам названия
+        doc = await self.es_search(
+            {"size": limit, "_source": ["id", "title"], "query": {"match_bool_prefix": {"title": prefix}}}
+        )
+        return [
+            {"id": hit["_source"]["id"], "text": hit["_source"]["title"], "kind": SuggestionKind.FILM.value}
+            for hit in doc["hits"]["hits"]
+        ]
+
+    async def facets(self, query: Optional[dict] = None, fuzzy_query: Optional[dict] = None) -> FilmFacets:
+        # Только агрегации, без документов; выбор фазы поиска тот же, что у списка фильмов
+        body = {"size": 0, "track_total_hits": True, "aggs": FACET_AGGS}
+        if query is not None:
+            body["query"] = query
+        doc = await self.es_search(body)
+        if fuzzy_query is not None and not exact_phase_wins(doc["hits"]["total"]["value"]):
+            doc = await self.es_search({**body, "query": fuzzy_query})
+
+        aggregations = doc["aggregations"]
+        return FilmFacets(
+            total=doc["hits"]["total"]["value"],
+            genre=term_buckets(aggregations["genre"]),
+            type=term_buckets(aggregations["type"]),
+            certificate=term_buckets(aggregations["certificate"]),
+            rating=[
+                RatingBucket(value=bucket["key"], count=bucket["doc_count"])
+                for bucket in aggregations["rating"]["buckets"]
+            ],
+            year=term_buckets(aggregations["year"]),
+        )
+
     async def get_from_elastic_scalar(self, film_id: str) -> Optional[Film]:
-        doc = await self.elastic.get("movies", film_id)
-        return Film(**doc["_source"])
-
-    async def get_from_elastic_many(self, es_query: Optional[dict] = None) -> Optional[list[Film]]:
-        if es_query:
-            doc = await self.elastic.search(
-                index="movies",
-                body=es_query.get("query"),
-                sort=es_query["sort"],
-                size=es_query["size"],
-                from_=es_query["from"],
-                _source=es_query["_source"],
-            )
-        else:
-            doc = await self.elastic.search(
-                index="movies",
-            )
-        return [Film(**film["_source"]) for film in doc]
+        doc = await self.es_get(film_id)
+        if doc is None:
+            return None
+        return self.build_models(await self.hydrate([doc["_source"]]))[0]
+
+    async def get_from_elastic_many(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ) -> Optional[list[BaseModel]]:
+        hits = await self.search_hits(es_query, fuzzy_query)
+        sources = [hit["_source"] for hit in hits]
+        if projection is None:
+            sources = await self.hydrate(sources)
+        return self.build_models(sources, projection)
 
 
 @lru_cache()
@@ -1,8 +1,9 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Optional, Type
 
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
+from pydantic import BaseModel
 
 from src.db.elastic import get_elastic
 from src.models.genre import Genre
@@ -10,6 +11,10 @@ from src.services.base import BaseService
 
 
 class GenreService(BaseService):
+    index = "genres"
+    namespace = "genres"
+    model = Genre
+
     async def get_by_id(self, genre_id: str) -> Optional[Genre]:
         genre = await self.get_from_elastic_scalar(genre_id)
         if not genre:
@@ -17,32 +22,32 @@ class GenreService(BaseService):
 
         return genre
 
-    async def get_list(self, es_query: Optional[dict] = None) -> list[Genre]:
-        genres = await self.get_from_elastic_many(es_query)
+    async def get_list(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ) -> list[BaseModel]:
+        genres = await self.get_from_elastic_many(es_query, projection, fuzzy_query)
         if genres is None:
             return []
 
         return genres
 
-    async def get_from_elastic_many(self, es_query: Optional[dict] = None) -> Optional[list[Genre]]:
-        if es_query:
-            doc = await self.elastic.search(
-                index="genres",
-                body=es_query.get("query"),
-                sort=es_query["sort"],
-                size=es_query["size"],
-                from_=es_query["from"],
-                _source=es_query["_source"],
-            )
-        else:
-            doc = await self.elastic.search(
-                index="genres",
-            )
-        return [Genre(**genre["_source"]) for genre in doc]
+    async def get_from_elastic_many(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ) -> Optional[list[BaseModel]]:
+        hits = await self.search_hits(es_query, fuzzy_query)
+        return self.build_models([hit["_source"] for hit in hits], projection)
 
     async def get_from_elastic_scalar(self, genre_id: str) -> Optional[Genre]:
-        doc = await self.elastic.get("genres", genre_id)
-        return Genre(**doc["_source"])
+        doc = await self.es_get(genre_id)
+        if doc is None:
+            return None
+        return self.build_models([doc["_source"]])[0]
 
 
 @lru_cache()
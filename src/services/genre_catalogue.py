@@ -0,0 +1,155 @@
+import asyncio
+import bisect
+import logging
+from typing import AsyncIterator, Optional
+
+from src.core.config import GENRE_CATALOGUE_REFRESH_INTERVAL, GENRE_CATALOGUE_STARTUP_TIMEOUT, SEARCH_STRATEGY
+from src.db import elastic
+from src.models.genre import Genre, GenreShort
+from src.services.base import exact_phase_wins
+from src.services.genre import GenreService, get_genre_service
+from src.services.pagination import Cursor, InvalidCursorError, sort_signature, with_tiebreaker
+from src.services.text import exact_match, fuzzy_match, normalize
+
+logger = logging.getLogger(__name__)
+
+GENRE_SOURCE = list(Genre.__fields__)
+SORT_FIELDS = ("id", "genre")
+# Поля сортировки в Elasticsearch: курсоры каталога и индекса взаимозаменяемы и подписаны одинаково
+ES_SORT_FIELDS = {"id": "id", "genre": "genre.raw"}
+
+catalogue: Optional["GenreCatalogue"] = None
+refresh_task: Optional[asyncio.Task] = None
+
+
+def sort_key(genre: Genre, field: str) -> tuple:
+    # Совпадает с search_after из Elasticsearch: значение поля сортировки, затем id
+    return (genre.id,) if field == "id" else (getattr(genre, field), genre.id)
+
+
+class GenreCatalogue:
+    # Жанры отсортированы заранее по каждому полю сортировки (по возрастанию), убывание - обход с конца
+    def __init__(self, genres: list[Genre], version: tuple):
+        self.version = version
+        self.by_id = {genre.id: genre for genre in genres}
+        self.terms = {genre.id: normalize(genre.genre).split() for genre in genres}
+        self.sorted: dict[str, tuple[list[tuple], list[GenreShort]]] = {}
+        for field in SORT_FIELDS:
+            ordered = sorted(genres, key=lambda genre: sort_key(genre, field))
+            self.sorted[field] = (
+                [sort_key(genre, field) for genre in ordered],
+                [GenreShort.construct(id=genre.id, genre=genre.genre) for genre in ordered],
+            )
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, genre_id: str) -> Optional[Genre]:
+        return self.by_id.get(genre_id)
+
+    async def get_by_ids(self, genre_ids: list[str]) -> dict[str, Genre]:
+        return {genre_id: self.by_id[genre_id] for genre_id in genre_ids if genre_id in self.by_id}
+
+    def select(
+        self, sort: str, search_query: Optional[str], fuzzy_only: bool = False
+    ) -> tuple[list[tuple], list[GenreShort]]:
+        # Те же фазы, что у поиска в Elasticsearch (text_queries): точная, а нечёткая - если точных мало.
+        # Курсорные страницы, как и в Elasticsearch, сразу нечёткие
+        keys, items = self.sorted[sort]
+        query_terms = normalize(search_query or "").split()
+        if not query_terms:
+            return keys, items
+
+        matched = None
+        if SEARCH_STRATEGY == "two_phase" and not fuzzy_only:
+            matched = [i for i, item in enumerate(items) if exact_match(query_terms, self.terms[item.id])]
+            if not exact_phase_wins(len(matched)):
+                matched = None
+        if matched is None:
+            matched = [i for i, item in enumerate(items) if fuzzy_match(query_terms, self.terms[item.id])]
+        return [keys[i] for i in matched], [items[i] for i in matched]
+
+    def get_list(self, sort: str, order: str, search_query: Optional[str], page: int, limit: int) -> list[GenreShort]:
+        _, items = self.select(sort, search_query)
+        offset = max(page - 1, 0) * limit
+        if order == "asc":
+            return items[offset : offset + limit]
+        end = max(len(items) - offset, 0)
+        return items[max(end - limit, 0) : end][::-1]
+
+    def get_page(
+        self, sort: str, order: str, search_query: Optional[str], limit: int, cursor: str
+    ) -> tuple[list[GenreShort], Optional[str]]:
+        keys, items = self.select(sort, search_query, fuzzy_only=True)
+        signature = sort_signature(with_tiebreaker([{ES_SORT_FIELDS[sort]: order}]))
+        cursor = Cursor.decode(cursor)
+        cursor.check_sort(signature)
+        search_after = cursor.search_after
+        try:
+            if order == "asc":
+                start = 0 if search_after is None else bisect.bisect_right(keys, tuple(search_after))
+                end = start + limit
+                page = items[start:end]
+            else:
+                end = len(keys) if search_after is None else bisect.bisect_left(keys, tuple(search_after))
+                start = max(end - limit, 0)
+                page = items[start:end][::-1]
+        except TypeError as exc:
+            raise InvalidCursorError("invalid cursor") from exc
+
+        if not page or len(page) < limit:
+            return page, None
+        last = start if order != "asc" else end - 1
+        return page, Cursor(list(keys[last]), sort=signature).encode()
+
+    async def iter_sources(self, batch_size: int) -> AsyncIterator[list[dict]]:
+        _, items = self.sorted["id"]
+        for start in range(0, len(items), batch_size):
+            yield [item.dict() for item in items[start : start + batch_size]]
+
+
+async def fetch_version(service: GenreService) -> tuple:
+    # Число документов и самый поздний modified: меняются при любом добавлении, правке или удалении жанра
+    doc = await service.es_search(
+        {"size": 0, "track_total_hits": True, "aggs": {"modified": {"max": {"field": "modified"}}}}
+    )
+    return doc["hits"]["total"]["value"], doc["aggregations"]["modified"]["value"]
+
+
+async def refresh() -> bool:
+    global catalogue
+    service = get_genre_service(elastic.es)
+    version = await fetch_version(service)
+    if catalogue is not None and catalogue.version == version:
+        return False
+
+    sources = []
+    async for batch in service.iter_sources(GENRE_SOURCE):
+        sources.extend(batch)
+    catalogue = GenreCatalogue(service.build_models(sources), version)
+    logger.info("genre catalogue loaded: %d genres", len(catalogue))
+    return True
+
+
+async def run_periodic_refresh(interval: float = GENRE_CATALOGUE_REFRESH_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh()
+        except Exception:
+            logger.exception("genre catalogue refresh failed")
+
+
+async def start_refresh():
+    global refresh_task
+    try:
+        await asyncio.wait_for(refresh(), GENRE_CATALOGUE_STARTUP_TIMEOUT)
+    except Exception:
+        # Пока каталог не загружен, жанры отдаются из Elasticsearch
+        logger.exception("genre catalogue load on startup failed")
+    refresh_task = asyncio.ensure_future(run_periodic_refresh())
+
+
+def stop_refresh():
+    if refresh_task is not None:
+        refresh_task.cancel()
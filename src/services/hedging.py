@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from src.core.config import (
+    ES_HEDGE_ENABLED,
+    ES_HEDGE_MIN_DELAY,
+    ES_HEDGE_MIN_SAMPLES,
+    ES_HEDGE_QUANTILE,
+    ES_HEDGE_RATIO,
+    ES_HEDGE_WINDOW,
+)
+from src.core.metrics import ES_HEDGED
+from src.services.limiter import es_limiter
+
+T = TypeVar("T")
+
+# Квантиль пересчитывается не на каждый ответ, а раз в столько замеров
+RECOMPUTE_EVERY = 50
+# Сколько неизрасходованных дублей может накопиться на случай всплеска медленных ответов
+MAX_TOKENS = 10
+
+
+class LatencyTracker:
+    def __init__(self, quantile: float, window: int, min_samples: int):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.samples: deque[float] = deque(maxlen=window)
+        self.value: Optional[float] = None
+        self._pending = 0
+
+    def observe(self, latency: float):
+        self.samples.append(latency)
+        self._pending += 1
+        if self._pending >= RECOMPUTE_EVERY and len(self.samples) >= self.min_samples:
+            ordered = sorted(self.samples)
+            self.value = ordered[min(int(len(ordered) * self.quantile), len(ordered) - 1)]
+            self._pending = 0
+
+
+class Hedger:
+    # Если чтение не ответило за квантиль недавних задержек, отправляем такой же второй запрос
+    # и берём первый успешный ответ, второй отменяем. Дубли ограничены долей ratio от всех вызовов
+    def __init__(
+        self,
+        quantile: float = ES_HEDGE_QUANTILE,
+        min_delay: float = ES_HEDGE_MIN_DELAY,
+        window: int = ES_HEDGE_WINDOW,
+        min_samples: int = ES_HEDGE_MIN_SAMPLES,
+        ratio: float = ES_HEDGE_RATIO,
+    ):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.ratio = ratio
+        self.tokens = 0.0
+        self.trackers: dict[str, LatencyTracker] = {}
+
+    def tracker(self, stage: str) -> LatencyTracker:
+        tracker = self.trackers.get(stage)
+        if tracker is None:
+            tracker = self.trackers[stage] = LatencyTracker(self.quantile, self.window, self.min_samples)
+        return tracker
+
+    def _may_hedge(self) -> bool:
+        # Пока к Elasticsearch есть очередь, дубль только добавит нагрузки
+        if self.tokens < 1 or getattr(es_limiter, "queued", 0):
+            return False
+        self.tokens -= 1
+        return True
+
+    async def _timed(self, tracker: LatencyTracker, attempt: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        result = await attempt()
+        tracker.observe(time.perf_counter() - start)
+        return result
+
+    async def run(self, stage: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        tracker = self.tracker(stage)
+        self.tokens = min(MAX_TOKENS, self.tokens + self.ratio)
+        primary = asyncio.ensure_future(self._timed(tracker, attempt))
+        pending = {primary}
+        try:
+            if tracker.value is not None:
+                done, _ = await asyncio.wait(pending, timeout=max(tracker.value, self.min_delay))
+                if not done and self._may_hedge():
+                    ES_HEDGED.inc(stage=stage, outcome="sent")
+                    pending.add(asyncio.ensure_future(self._timed(tracker, attempt)))
+
+            # Побеждает первый успешный ответ; ошибка одной попытки ждёт исхода другой
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                failed = [task for task in done if task.exception() is not None]
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            ES_HEDGED.inc(stage=stage, outcome="won")
+                        return task.result()
+                if not pending:
+                    raise failed[0].exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+class NoHedger:
+    async def run(self, stage: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        return await attempt()
+
+
+es_hedger = Hedger() if ES_HEDGE_ENABLED else NoHedger()
@@ -0,0 +1,52 @@
+from collections import Counter
+
+import orjson
+from aioredis import Redis
+
+from src.core.config import WARMUP_HOT_KEYS_TRACKED, WARMUP_HOT_KEYS_TTL
+from src.services.cache_keys import normalize_params
+
+HOT_KEYS_KEY = "warmup:hot"
+# Запросы с такими параметрами повторить нельзя: курсор ссылается на point-in-time, который истекает
+NON_REPLAYABLE_PARAMS = ("cursor",)
+
+
+def is_replayable(params: dict) -> bool:
+    return all(params.get(name) is None for name in NON_REPLAYABLE_PARAMS)
+
+
+class HotKeys:
+    # Частоту запросов копим в памяти и сбрасываем в общий sorted set пачкой, а не на каждый запрос
+    def __init__(self, key: str = HOT_KEYS_KEY, max_items: int = WARMUP_HOT_KEYS_TRACKED):
+        self.key = key
+        self.max_items = max_items
+        self._counts: Counter = Counter()
+
+    def record(self, endpoint: str, params: dict):
+        if not is_replayable(params):
+            return
+        member = orjson.dumps({"endpoint": endpoint, "params": normalize_params(params)}, option=orjson.OPT_SORT_KEYS)
+        self._counts[member] += 1
+        if len(self._counts) > 2 * self.max_items:
+            # Между сбросами в памяти остаются только самые частые запросы: редкие в прогрев всё равно не попадут
+            self._counts = Counter(dict(self._counts.most_common(self.max_items)))
+
+    async def flush(self, redis: Redis):
+        counts, self._counts = self._counts, Counter()
+        if not counts:
+            return
+
+        pipe = redis.pipeline()
+        for member, count in counts.items():
+            pipe.zincrby(self.key, count, member)
+        # Храним только самые частые запросы, чтобы множество не росло бесконечно
+        pipe.zremrangebyrank(self.key, 0, -WARMUP_HOT_KEYS_TRACKED - 1)
+        pipe.expire(self.key, WARMUP_HOT_KEYS_TTL)
+        await pipe.execute()
+
+    async def top(self, redis: Redis, limit: int) -> list[dict]:
+        members = await redis.zrevrange(self.key, 0, limit - 1)
+        return [orjson.loads(member) for member in members]
+
+
+hot_keys = HotKeys()
@@ -0,0 +1,61 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+import orjson
+from starlette.datastructures import Headers
+
+# Заголовки, которые повторяются в ответе 304
+VALIDATOR_HEADERS = ("etag", "last-modified", "cache-control")
+
+
+def make_etag(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+def parse_http_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def last_modified(data: bytes) -> Optional[datetime]:
+    # modified самой сущности; списки сюда не попадают: удалённый или выпавший из выборки элемент
+    # не меняет modified оставшихся, и ответ 304 отдал бы устаревший список
+    body = orjson.loads(data)
+    modified = body.get("modified") if isinstance(body, dict) else None
+    if not isinstance(modified, str):
+        return None
+    try:
+        value = datetime.fromisoformat(modified)
+    except ValueError:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def validators(data: bytes, entity: bool) -> dict:
+    # Для списков временем изменения считаем момент расчёта записи кеша
+    now = datetime.now(timezone.utc)
+    modified = (last_modified(data) if entity else None) or now
+    return {"etag": make_etag(data), "last-modified": format_datetime(min(modified, now), usegmt=True)}
+
+
+def is_not_modified(request_headers: Headers, headers: dict) -> bool:
+    # If-None-Match главнее If-Modified-Since; для GET сравнение ETag слабое (RFC 7232)
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers.get("etag")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or (etag is not None and etag.removeprefix("W/") in tags)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or "last-modified" not in headers:
+        return False
+    since = parse_http_date(if_modified_since)
+    modified = parse_http_date(headers["last-modified"])
+    return since is not None and modified is not None and modified <= since
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Optional
+
+import orjson
+from aioredis import Redis
+
+from src.core.config import CACHE_INVALIDATION_CHANNEL, CACHE_INVALIDATION_RETRY_INTERVAL
+from src.core.metrics import CACHE_INVALIDATIONS
+from src.db import redis
+from src.db.redis import get_redis
+from src.services.cache_keys import cache_keys
+
+# Сообщение об изменениях от ETL:
+#   {"entity": "films", "ids": ["..."]} - точечно сбросить записи с этими сущностями;
+#   {"entity": "films", "all": true}    - сбросить всё пространство имён (новые документы, переиндексация).
+# entity - пространство имён кеша: films, genres или people.
+
+logger = logging.getLogger(__name__)
+
+listener_task: Optional[asyncio.Task] = None
+
+
+def tag_name(namespace: str, entity_id) -> str:
+    return f"{namespace}:{entity_id}"
+
+
+def collect_tags(namespace: str, data: bytes, tag_own_ids: bool, tag_fields: Optional[dict] = None) -> list[str]:
+    # Теги записи: id сущностей в ответе и вложенных сущностей из полей tag_fields ({поле: пространство имён})
+    body = orjson.loads(data)
+    tags = set()
+    for item in body if isinstance(body, list) else [body]:
+        if not isinstance(item, dict):
+            continue
+        if tag_own_ids and "id" in item:
+            tags.add(tag_name(namespace, item["id"]))
+        for field, nested_namespace in (tag_fields or {}).items():
+            for nested in item.get(field) or []:
+                if isinstance(nested, dict) and "id" in nested:
+                    tags.add(tag_name(nested_namespace, nested["id"]))
+    return sorted(tags)
+
+
+async def publish_changes(publisher: Redis, namespace: str, entity_ids: Optional[list[str]] = None):
+    # Для писателей индексов: без entity_ids сбрасывается всё пространство имён
+    if entity_ids:
+        message = {"entity": namespace, "ids": entity_ids}
+    else:
+        # Поколение меняет сам писатель, воркерам остаётся только забыть закешированный номер
+        await publisher.incr(cache_keys.generation_key(namespace))
+        message = {"entity": namespace, "all": True}
+    await publisher.publish(CACHE_INVALIDATION_CHANNEL, orjson.dumps(message))
+
+
+async def invalidate(namespace: str, entity_ids: list[str]) -> int:
+    cache = await get_redis()
+    keys = await cache_keys.entity_keys(cache, namespace, entity_ids)
+    keys.extend(await cache.get_tagged([tag_name(namespace, entity_id) for entity_id in entity_ids]))
+    # Сообщение получает каждый воркер: Redis чистится повторно, зато локальный кеш - в каждом процессе
+    await cache.delete(keys)
+    CACHE_INVALIDATIONS.inc(len(keys), namespace=namespace)
+    return len(keys)
+
+
+async def handle_message(data: bytes):
+    message = orjson.loads(data)
+    namespace = message["entity"]
+    if message.get("all"):
+        cache_keys.forget(namespace)
+        CACHE_INVALIDATIONS.inc(namespace=namespace)
+        return
+    await invalidate(namespace, [str(entity_id) for entity_id in message.get("ids") or []])
+
+
+async def listen():
+    while True:
+        try:
+            (channel,) = await redis.redis.subscribe(CACHE_INVALIDATION_CHANNEL)
+            while await channel.wait_message():
+                data = await channel.get()
+                try:
+                    await handle_message(data)
+                except Exception:
+                    logger.exception("bad cache invalidation message: %r", data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("cache invalidation listener failed, resubscribing")
+        await asyncio.sleep(CACHE_INVALIDATION_RETRY_INTERVAL)
+
+
+def start_listener():
+    global listener_task
+    listener_task = asyncio.ensure_future(listen())
+
+
+async def stop_listener():
+    if listener_task is None:
+        return
+    listener_task.cancel()
+    await redis.redis.unsubscribe(CACHE_INVALIDATION_CHANNEL)
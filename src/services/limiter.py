@@ -0,0 +1,148 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from http import HTTPStatus
+
+from elasticsearch import ConnectionError, TransportError
+
+from src.core.config import (
+    ES_LIMIT_BACKOFF,
+    ES_LIMIT_INITIAL,
+    ES_LIMIT_LATENCY_TARGET,
+    ES_LIMIT_MAX,
+    ES_LIMIT_MIN,
+    ES_LIMIT_QUEUE,
+    ES_LIMIT_QUEUE_TIMEOUT,
+    ES_LIMITER_ENABLED,
+)
+from src.core.metrics import ES_LIMITER, ES_LIMITER_REJECTED
+from src.services.budget import BudgetExceededError, remaining
+
+
+class OverloadedError(Exception):
+    status_code = HTTPStatus.SERVICE_UNAVAILABLE
+
+    def __init__(self, retry_after: int):
+        super().__init__("backend overloaded")
+        self.retry_after = retry_after
+
+
+def is_overload(exc: BaseException) -> bool:
+    # Недоступность и явный отказ кластера - сигнал перегрузки; 404 и ошибки запроса - нет
+    if isinstance(exc, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    return isinstance(exc, TransportError) and exc.status_code in (429, 503)
+
+
+class AdaptiveLimiter:
+    # AIMD: каждый быстрый ответ поднимает лимит на 1/limit (на единицу за «окно» из limit вызовов),
+    # медленный ответ или отказ кластера умножает лимит на backoff.
+    # Сверх лимита вызовы ждут в ограниченной очереди, при переполнении сразу отказываем
+    def __init__(
+        self,
+        initial: int = ES_LIMIT_INITIAL,
+        min_limit: int = ES_LIMIT_MIN,
+        max_limit: int = ES_LIMIT_MAX,
+        latency_target: float = ES_LIMIT_LATENCY_TARGET,
+        backoff: float = ES_LIMIT_BACKOFF,
+        max_queue: int = ES_LIMIT_QUEUE,
+        queue_timeout: float = ES_LIMIT_QUEUE_TIMEOUT,
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.latency = latency_target / 2
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        # Примерное время, за которое разойдётся текущая очередь
+        return max(1, math.ceil(self.latency * (self.queued + 1) / self.limit))
+
+    def reject(self, reason: str):
+        ES_LIMITER_REJECTED.inc(reason=reason)
+        raise OverloadedError(self.retry_after())
+
+    async def _acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.reject("queue_full")
+
+        # В очереди ждём не дольше остатка бюджета запроса
+        left = remaining()
+        timeout = self.queue_timeout if left is None else min(self.queue_timeout, left)
+
+        # Освободившийся слот передаётся ожидающему напрямую, in_flight уже учитывает его
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            if timeout < self.queue_timeout:
+                ES_LIMITER_REJECTED.inc(reason="deadline")
+                raise BudgetExceededError() from None
+            self.reject("queue_timeout")
+
+    def _release(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _sample(self, latency: float, overloaded: bool):
+        self.latency += (latency - self.latency) * 0.1
+        if overloaded or latency > self.latency_target:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        start = time.perf_counter()
+        overloaded = False
+        try:
+            yield
+        except BaseException as exc:
+            overloaded = is_overload(exc)
+            raise
+        finally:
+            self._sample(time.perf_counter() - start, overloaded)
+            self._release()
+
+
+class NoLimiter:
+    queued = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        yield
+
+
+es_limiter = AdaptiveLimiter() if ES_LIMITER_ENABLED else NoLimiter()
+
+if ES_LIMITER_ENABLED:
+    ES_LIMITER.set_function(lambda: es_limiter.limit, stat="limit")
+    ES_LIMITER.set_function(lambda: es_limiter.in_flight, stat="in_flight")
+    ES_LIMITER.set_function(lambda: es_limiter.queued, stat="queued")
@@ -0,0 +1,103 @@
+import asyncio
+from typing import Optional
+
+from elasticsearch import AsyncElasticsearch, TransportError
+from elasticsearch.exceptions import HTTP_EXCEPTIONS
+
+from src.core.config import ES_MSEARCH_ENABLED, ES_MSEARCH_MAX_BATCH, ES_MSEARCH_WINDOW
+from src.core.metrics import ES_MSEARCH_BATCH
+from src.services.background import run_in_background
+from src.services.budget import BudgetExceededError, request_params
+
+
+class PendingSearch:
+    def __init__(self, index: Optional[str], body: Optional[dict], left: Optional[float]):
+        self.index = index
+        self.body = body or {}
+        self.left = left
+        self.future = asyncio.get_running_loop().create_future()
+
+
+def item_error(item: dict) -> TransportError:
+    # Ошибка отдельного поиска внутри _msearch - то же исключение, что вернул бы одиночный search
+    status = item.get("status", "N/A")
+    error = item.get("error") or {}
+    error_type = error.get("type", "") if isinstance(error, dict) else str(error)
+    return HTTP_EXCEPTIONS.get(status, TransportError)(status, error_type, item)
+
+
+class SearchBatcher:
+    # Поиски, пришедшие за window секунд, уходят одним _msearch (не больше max_batch в пачке),
+    # ответы раздаются ожидающим в том же порядке
+    def __init__(self, window: float = ES_MSEARCH_WINDOW, max_batch: int = ES_MSEARCH_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[AsyncElasticsearch, list[PendingSearch]] = {}
+
+    async def search(
+        self, elastic: AsyncElasticsearch, index: Optional[str], body: Optional[dict], left: Optional[float]
+    ) -> dict:
+        search = PendingSearch(index, body, left)
+        batch = self._pending.setdefault(elastic, [])
+        batch.append(search)
+        if len(batch) >= self.max_batch:
+            self._flush(elastic)
+        elif len(batch) == 1:
+            asyncio.get_running_loop().call_later(self.window, self._flush, elastic, batch)
+
+        if left is None:
+            return await search.future
+        # Пачка ждёт самого терпеливого из поисков, у каждого остаётся свой срок
+        try:
+            return await asyncio.wait_for(asyncio.shield(search.future), left)
+        except asyncio.TimeoutError:
+            raise BudgetExceededError() from None
+        finally:
+            # Ответ, который уже никто не ждёт, при раздаче пропускается
+            search.future.cancel()
+
+    def _flush(self, elastic: AsyncElasticsearch, batch: Optional[list[PendingSearch]] = None):
+        # Таймер отправляет только свою пачку: если она уже ушла по размеру, следующая ждёт своего таймера
+        if batch is not None and self._pending.get(elastic) is not batch:
+            return
+        batch = [search for search in self._pending.pop(elastic, []) if not search.future.done()]
+        if batch:
+            run_in_background(self._send(elastic, batch))
+
+    async def _send(self, elastic: AsyncElasticsearch, batch: list[PendingSearch]):
+        ES_MSEARCH_BATCH.observe(len(batch))
+        lefts = [search.left for search in batch]
+        left = None if None in lefts else max(lefts)
+        try:
+            if len(batch) == 1:
+                search = batch[0]
+                responses = [await elastic.search(index=search.index, body=search.body, **request_params(left))]
+            else:
+                body = []
+                for search in batch:
+                    body.append({} if search.index is None else {"index": search.index})
+                    body.append(search.body)
+                responses = (await elastic.msearch(body=body, **request_params(left)))["responses"]
+        except Exception as exc:
+            for search in batch:
+                if not search.future.done():
+                    search.future.set_exception(exc)
+            return
+
+        for search, response in zip(batch, responses):
+            if search.future.done():
+                continue
+            if "error" in response:
+                search.future.set_exception(item_error(response))
+            else:
+                search.future.set_result(response)
+
+
+class NoBatcher:
+    async def search(
+        self, elastic: AsyncElasticsearch, index: Optional[str], body: Optional[dict], left: Optional[float]
+    ) -> dict:
+        return await elastic.search(index=index, body=body, **request_params(left))
+
+
+es_batcher = SearchBatcher() if ES_MSEARCH_ENABLED else NoBatcher()
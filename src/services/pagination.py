@@ -0,0 +1,52 @@
+import base64
+import binascii
+from typing import Optional
+
+import orjson
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class Cursor:
+    __slots__ = ("search_after", "pit_id", "sort")
+
+    def __init__(self, search_after: Optional[list] = None, pit_id: Optional[str] = None, sort: Optional[str] = None):
+        self.search_after = search_after
+        self.pit_id = pit_id
+        # Сортировка, для которой получен search_after: с другой сортировкой Elasticsearch ответит 400
+        self.sort = sort
+
+    def encode(self) -> str:
+        payload = orjson.dumps({"sa": self.search_after, "pit": self.pit_id, "s": self.sort})
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, value: str) -> "Cursor":
+        # Пустой курсор - первая страница в курсорном режиме
+        if not value:
+            return cls()
+        try:
+            payload = orjson.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+            return cls(payload["sa"], payload["pit"], payload.get("s"))
+        except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError) as exc:
+            raise InvalidCursorError("invalid cursor") from exc
+
+    def check_sort(self, sort: str):
+        if self.search_after is not None and self.sort != sort:
+            raise InvalidCursorError("cursor was issued for another sort")
+
+
+def with_tiebreaker(sort: list[dict]) -> list[dict]:
+    # search_after требует однозначного порядка, поэтому добавляем id последним полем сортировки
+    if any("id" in field for field in sort):
+        return sort
+    order = next(iter(sort[0].values())) if sort else "asc"
+    return [*sort, {"id": order}]
+
+
+def sort_signature(sort: list[dict]) -> str:
+    return ",".join(f"{field}:{order}" for item in sort for field, order in item.items())
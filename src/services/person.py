@@ -1,8 +1,9 @@
 from functools import lru_cache
-from typing import Optional
+from typing import Optional, Type
 
 from elasticsearch import AsyncElasticsearch
 from fastapi import Depends
+from pydantic import BaseModel
 
 from src.db.elastic import get_elastic
 from src.models.person import Person
@@ -10,6 +11,10 @@ from src.services.base import BaseService
 
 
 class PersonService(BaseService):
+    index = "people"
+    namespace = "people"
+    model = Person
+
     async def get_by_id(self, person_id: str) -> Optional[Person]:
         person = await self.get_from_elastic_scalar(person_id)
         if not person:
@@ -17,32 +22,32 @@ class PersonService(BaseService):
 
         return person
 
-    async def get_list(self, es_query: Optional[dict] = None) -> list[Person]:
-        people = await self.get_from_elastic_many(es_query)
+    async def get_list(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ) -> list[BaseModel]:
+        people = await self.get_from_elastic_many(es_query, projection, fuzzy_query)
         if people is None:
             return []
 
         return people
 
-    async def get_from_elastic_many(self, es_query: Optional[dict] = None) -> Optional[list[Person]]:
-        if es_query:
-            doc = await self.elastic.search(
-                index="people",
-                body=es_query.get("query"),
-                sort=es_query["sort"],
-                size=es_query["size"],
-                from_=es_query["from"],
-                _source=es_query["_source"],
-            )
-        else:
-            doc = await self.elastic.search(
-                index="people",
-            )
-        return [Person(**person["_source"]) for person in doc]
+    async def get_from_elastic_many(
+        self,
+        es_query: Optional[dict] = None,
+        projection: Optional[Type[BaseModel]] = None,
+        fuzzy_query: Optional[dict] = None,
+    ) -> Optional[list[BaseModel]]:
+        hits = await self.search_hits(es_query, fuzzy_query)
+        return self.build_models([hit["_source"] for hit in hits], projection)
 
     async def get_from_elastic_scalar(self, person_id: str) -> Optional[Person]:
-        doc = await self.elastic.get("people", person_id)
-        return Person(**doc["_source"])
+        doc = await self.es_get(person_id)
+        if doc is None:
+            return None
+        return self.build_models([doc["_source"]])[0]
 
 
 @lru_cache()
@@ -0,0 +1,29 @@
+from typing import Optional
+
+from src.core.config import SEARCH_STRATEGY
+
+
+def text_queries(search_query: str, fields: list[str]) -> tuple[dict, Optional[dict]]:
+    # Запрос для es_query["query"] и нечёткий запрос второй фазы (None - фаза одна)
+    fuzzy = {"multi_match": {"query": search_query, "fuzziness": "auto", "fields": fields}}
+    if SEARCH_STRATEGY != "two_phase":
+        return fuzzy, None
+
+    # Без fuzziness термы не разворачиваются в варианты; phrase_prefix ловит недописанное последнее слово
+    exact = {
+        "bool": {
+            "should": [
+                {"multi_match": {"query": search_query, "fields": fields}},
+                {"multi_match": {"query": search_query, "fields": fields, "type": "phrase_prefix"}},
+            ]
+        }
+    }
+    return exact, fuzzy
+
+
+def with_filters(query: Optional[dict], filters: list[dict]) -> dict:
+    # Фильтры не влияют на релевантность, Elasticsearch кеширует их отдельно от текстового запроса
+    bool_query = {"filter": filters}
+    if query is not None:
+        bool_query["must"] = [query]
+    return {"bool": bool_query}
@@ -0,0 +1,161 @@
+import asyncio
+import bisect
+import heapq
+import logging
+from itertools import count
+from operator import itemgetter
+from typing import Callable, Iterable, Optional
+
+from src.core.config import (
+    SUGGEST_MAX_FILMS,
+    SUGGEST_MAX_LIMIT,
+    SUGGEST_MAX_PEOPLE,
+    SUGGEST_MAX_WORDS,
+    SUGGEST_REFRESH_INTERVAL,
+    SUGGEST_SHORT_PREFIX,
+)
+from src.db import elastic
+from src.models.suggestion import SuggestionKind
+from src.services.base import BaseService
+from src.services.film import get_film_service
+from src.services.person import get_person_service
+from src.services.text import normalize
+
+logger = logging.getLogger(__name__)
+
+# Больше любого символа: верхняя граница диапазона ключей с общим префиксом
+MAX_CHAR = chr(0x10FFFF)
+# Ответы по префиксам с большим числом совпадений запоминаем: индекс неизменяем до следующей загрузки
+WIDE_RANGE = 2048
+WIDE_MEMO_SIZE = 4096
+
+suggest_index: Optional["PrefixIndex"] = None
+refresh_task: Optional[asyncio.Task] = None
+
+
+class PrefixIndex:
+    # Отсортированные ключи ищем бинарным поиском, для коротких префиксов лучшие подсказки посчитаны заранее.
+    # Каждая строка индексируется и с первых max_words слов, чтобы "wars" находил "Star Wars"
+    def __init__(
+        self,
+        entries: Iterable[tuple[float, dict, str]],
+        short_prefix: int = SUGGEST_SHORT_PREFIX,
+        top: int = SUGGEST_MAX_LIMIT,
+        max_words: int = SUGGEST_MAX_WORDS,
+    ):
+        keyed = []
+        for weight, suggestion, text in entries:
+            words = normalize(text).split()
+            for i in range(min(len(words), max_words)):
+                keyed.append((" ".join(words[i:]), -weight, suggestion))
+        keyed.sort(key=itemgetter(0))
+
+        self.keys = [key for key, _, _ in keyed]
+        self.items = [(weight, suggestion) for _, weight, suggestion in keyed]
+        self.max_words = max_words
+        self.short_prefix = short_prefix
+        self.wide: dict[tuple[str, int], list[dict]] = {}
+        self.short: dict[str, list[dict]] = {}
+        for key, _, suggestion in sorted(keyed, key=itemgetter(1)):
+            for length in range(1, min(short_prefix, len(key)) + 1):
+                best = self.short.setdefault(key[:length], [])
+                if len(best) < top and suggestion not in best:
+                    best.append(suggestion)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, prefix: str, limit: int) -> list[dict]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= self.short_prefix:
+            return self.short.get(prefix, [])[:limit]
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + MAX_CHAR, start)
+        if end - start <= WIDE_RANGE:
+            return self.best(start, end, limit)
+
+        memo_key = (prefix, limit)
+        suggestions = self.wide.get(memo_key)
+        if suggestions is None:
+            if len(self.wide) >= WIDE_MEMO_SIZE:
+                del self.wide[next(iter(self.wide))]
+            suggestions = self.wide[memo_key] = self.best(start, end, limit)
+        return suggestions
+
+    def best(self, start: int, end: int, limit: int) -> list[dict]:
+        # Одна сущность встречается не больше max_words раз, так что уникальных кандидатов хватит
+        candidates = heapq.nsmallest(limit * self.max_words, self.items[start:end], key=itemgetter(0))
+        suggestions = []
+        for _, suggestion in candidates:
+            if suggestion not in suggestions:
+                suggestions.append(suggestion)
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+
+async def top_sources(service: BaseService, source: list[str], weight: Callable[[dict], float], limit: int) -> list:
+    # Индекс обходим целиком, но в памяти держим не больше limit документов с наибольшим весом
+    heap = []
+    tiebreaker = count()
+    async for batch in service.iter_sources(source):
+        for doc in batch:
+            item = (weight(doc), next(tiebreaker), doc)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heappushpop(heap, item)
+    return [(doc_weight, doc) for doc_weight, _, doc in heap]
+
+
+async def load_index() -> PrefixIndex:
+    films = await top_sources(
+        get_film_service(elastic.es),
+        ["id", "title", "imdb_rating"],
+        lambda doc: doc.get("imdb_rating") or 0,
+        SUGGEST_MAX_FILMS,
+    )
+    people = await top_sources(
+        get_person_service(elastic.es), ["id", "first_name", "last_name"], lambda doc: 0, SUGGEST_MAX_PEOPLE
+    )
+
+    # Фильмы ранжируются по рейтингу и идут раньше персон
+    entries = [
+        (doc_weight, {"id": doc["id"], "text": doc["title"], "kind": SuggestionKind.FILM.value}, doc["title"])
+        for doc_weight, doc in films
+    ]
+    for _, doc in people:
+        name = f"{doc['first_name']} {doc['last_name']}"
+        entries.append((-1, {"id": str(doc["id"]), "text": name, "kind": SuggestionKind.PERSON.value}, name))
+
+    # Сортировка сотен тысяч ключей заметна по времени: строим индекс вне цикла событий
+    return await asyncio.get_running_loop().run_in_executor(None, PrefixIndex, entries)
+
+
+async def refresh():
+    global suggest_index
+    suggest_index = await load_index()
+    logger.info("suggest index refreshed: %d keys", len(suggest_index))
+
+
+async def run_periodic_refresh(interval: float = SUGGEST_REFRESH_INTERVAL):
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            # До первой удачной загрузки подсказки отдаёт Elasticsearch
+            logger.exception("suggest index refresh failed")
+        await asyncio.sleep(interval)
+
+
+def start_refresh():
+    global refresh_task
+    refresh_task = asyncio.ensure_future(run_periodic_refresh())
+
+
+def stop_refresh():
+    if refresh_task is not None:
+        refresh_task.cancel()
@@ -0,0 +1,55 @@
+import re
+import unicodedata
+
+WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    # Регистр, диакритика (ё -> е) и пунктуация на поиск не влияют
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return " ".join(WORD.findall("".join(char for char in decomposed if not unicodedata.combining(char))))
+
+
+def auto_fuzziness(term: str) -> int:
+    # Как fuzziness: AUTO в Elasticsearch: до 3 символов точно, до 6 - одна правка, дальше две
+    if len(term) < 3:
+        return 0
+    return 1 if len(term) < 6 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Расстояние Дамерау-Левенштейна (с перестановкой соседних символов); больше limit не считаем
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def fuzzy_match(query_terms: list[str], terms: list[str]) -> bool:
+    # Совпадение хотя бы одного слова запроса, как у multi_match с оператором OR
+    for query in query_terms:
+        limit = auto_fuzziness(query)
+        if any(edit_distance(query, term, limit) <= limit for term in terms):
+            return True
+    return False
+
+
+def exact_match(query_terms: list[str], terms: list[str]) -> bool:
+    # Точная фаза двухфазного поиска: слово запроса совпадает со словом целиком (multi_match без fuzziness)
+    # или запрос - начало фразы с недописанным последним словом (phrase_prefix)
+    if any(query in terms for query in query_terms):
+        return True
+    *head, last = query_terms
+    return any(
+        terms[start : start + len(head)] == head and terms[start + len(head)].startswith(last)
+        for start in range(len(terms) - len(head))
+    )
@@ -0,0 +1,134 @@
+import asyncio
+import inspect
+import logging
+from enum import Enum
+from typing import Optional
+
+from fastapi import params
+
+from src.core.config import (
+    CACHE_FALLBACK_TTL,
+    WARMUP_CONCURRENCY,
+    WARMUP_INTERVAL,
+    WARMUP_STARTUP_TIMEOUT,
+    WARMUP_TOP_KEYS,
+)
+from src.db import redis
+from src.db.redis import get_redis
+from src.services.cache_entry import CacheEntry
+from src.services.cache_keys import cache_keys
+from src.services.hot_keys import hot_keys, is_replayable
+from src.utils import CachedEndpoint, cached_endpoints
+
+logger = logging.getLogger(__name__)
+
+warmup_task: Optional[asyncio.Task] = None
+
+
+async def resolve_dependency(dependency):
+    kwargs = {}
+    for name, parameter in inspect.signature(dependency).parameters.items():
+        if isinstance(parameter.default, params.Depends):
+            kwargs[name] = await resolve_dependency(parameter.default.dependency)
+
+    rv = dependency(**kwargs)
+    if inspect.isawaitable(rv):
+        rv = await rv
+    return rv
+
+
+async def build_kwargs(endpoint: CachedEndpoint, request_params: dict) -> dict:
+    # Восстанавливаем аргументы эндпоинта: сервисы из Depends, перечисления из сохранённых значений
+    kwargs = {}
+    for name, parameter in inspect.signature(endpoint.func).parameters.items():
+        if isinstance(parameter.default, params.Depends):
+            kwargs[name] = await resolve_dependency(parameter.default.dependency)
+        elif name in request_params:
+            value = request_params[name]
+            if inspect.isclass(parameter.annotation) and issubclass(parameter.annotation, Enum) and value is not None:
+                value = parameter.annotation(value)
+            kwargs[name] = value
+        elif isinstance(parameter.default, params.Param):
+            # Query(...) в сигнатуре: значение по умолчанию внутри
+            kwargs[name] = parameter.default.default
+        elif parameter.default is not inspect.Parameter.empty:
+            kwargs[name] = parameter.default
+    return kwargs
+
+
+async def warm_up(limit: int = WARMUP_TOP_KEYS, concurrency: int = WARMUP_CONCURRENCY) -> int:
+    cache = await get_redis()
+    requests = []
+    for request in await hot_keys.top(redis.redis, limit):
+        endpoint = cached_endpoints.get(request["endpoint"])
+        # Записи со старых версий могут содержать курсорные страницы
+        if endpoint is None or not is_replayable(request["params"]):
+            continue
+        kwargs = await build_kwargs(endpoint, request["params"])
+        requests.append((endpoint, kwargs, await endpoint.cache_key(cache, kwargs)))
+
+    if not requests:
+        return 0
+
+    cold = []
+    for request, raw in zip(requests, await cache.get_many([key for _, _, key in requests])):
+        entry = CacheEntry.unpack(raw)
+        if entry is None or entry.is_stale:
+            cold.append(request)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def compute(endpoint: CachedEndpoint, kwargs: dict, key: str):
+        async with semaphore:
+            try:
+                entry, store = await endpoint.compute(kwargs)
+            except Exception as exc:
+                logger.warning("cache warm-up of %s failed: %r", endpoint.name, exc)
+                return None
+        return (endpoint, key, entry, endpoint.keeps_fallback(kwargs)) if store else None
+
+    # Значения пишем пайплайнами, сгруппировав по TTL
+    batches: dict[int, dict[str, bytes]] = {}
+    tags: dict[int, dict[str, list[str]]] = {}
+    fallbacks: dict[str, bytes] = {}
+    for result in await asyncio.gather(*(compute(*request) for request in cold)):
+        if result is not None:
+            endpoint, key, entry, keeps_fallback = result
+            packed = batches.setdefault(endpoint.hard_ttl, {})[key] = entry.pack()
+            tags.setdefault(endpoint.hard_ttl, {})[key] = endpoint.tags(entry)
+            if keeps_fallback:
+                fallbacks[cache_keys.fallback_key(key)] = packed
+    for ttl, items in batches.items():
+        await cache.cache_many(items, ttl)
+        await cache.tag_many(tags[ttl], ttl)
+    await cache.cache_fallback(fallbacks, CACHE_FALLBACK_TTL)
+
+    warmed = sum(len(items) for items in batches.values())
+    logger.info("cache warm-up: %d hot requests, %d recomputed", len(requests), warmed)
+    return warmed
+
+
+async def run_periodic_warmup(interval: float = WARMUP_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await hot_keys.flush(redis.redis)
+            await warm_up()
+        except Exception:
+            logger.exception("periodic cache warm-up failed")
+
+
+async def start_warmup():
+    global warmup_task
+    try:
+        await asyncio.wait_for(warm_up(), WARMUP_STARTUP_TIMEOUT)
+    except Exception:
+        # Холодный кеш не повод не поднимать сервис
+        logger.exception("cache warm-up on startup failed")
+    warmup_task = asyncio.ensure_future(run_periodic_warmup())
+
+
+async def stop_warmup():
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await hot_keys.flush(redis.redis)
@@ -1,41 +1,339 @@
+import asyncio
+import inspect
+import time
 from functools import wraps
+from http import HTTPStatus
+from typing import AsyncGenerator, AsyncIterator, Optional, get_origin, get_type_hints
 
 import orjson
+from fastapi import Request, Response, params
+from fastapi.responses import ORJSONResponse
+from pydantic import parse_obj_as
+from pydantic.json import pydantic_encoder
 
+from src.core.config import (
+    CACHE_FALLBACK_TTL,
+    CACHE_LOCK_ENABLED,
+    CACHE_LOCK_POLL_INTERVAL,
+    CACHE_LOCK_TTL,
+    CACHE_STALE_TTL,
+    CACHE_TTL,
+    HTTP_CACHE_MAX_AGE,
+    WARMUP_ENABLED,
+)
+from src.core.metrics import CACHE_REQUESTS, current_route, observe_stage
 from src.db.redis import get_redis
+from src.services.background import run_in_background
+from src.services.breaker import BACKEND_ERRORS
+from src.services.budget import remaining, without_budget
+from src.services.cache_entry import CacheEntry
+from src.services.cache_keys import cache_keys
+from src.services.hot_keys import hot_keys
+from src.services.http_cache import VALIDATOR_HEADERS, is_not_modified, make_etag, validators
+from src.services.invalidation import collect_tags
+from src.services.pagination import NEXT_CURSOR_HEADER
+from src.services.single_flight import SingleFlight
+
+# Параметр, через который закешированный эндпоинт получает запрос для условных заголовков
+REQUEST_PARAM = "cached_request"
+# Помечает ответ из резервной копии, отданный при недоступном Elasticsearch
+FALLBACK_HEADER = "X-Cache-Fallback"
+# Параметры списка, которые не мешают хранить резервную копию: их значений немного
+FALLBACK_VARYING_PARAMS = ("sort", "sort_order")
+
+single_flight = SingleFlight()
 
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
 
 
-def cached(decoder, many: bool = False):
+async def wait_for_cache(cache, key: str, timeout: float) -> Optional[CacheEntry]:
+    # Ждём, пока держатель блокировки жив, и не дольше бюджета запроса.
+    # Блокировка снята без записи (404, ошибка, no-store) - значит ждать нечего, считаем сами
+    left = remaining()
+    if left is not None:
+        timeout = min(timeout, left)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CACHE_LOCK_POLL_INTERVAL)
+        entry = CacheEntry.unpack(await cache.get_from_cache(key))
+        if entry is not None:
+            return entry
+        if not await cache.is_locked(key):
+            return None
+    return None
+
+
+def response_model(func) -> Optional[type]:
+    # Аннотация возврата эндпоинта совпадает с response_model его маршрута; готовый Response не проверяем
+    model = get_type_hints(func).get("return")
+    if model is None or (get_origin(model) is None and issubclass(model, Response)):
+        return None
+    return model
+
+
+def default_params(func) -> dict:
+    # Значения по умолчанию параметров запроса эндпоинта (зависимости не в счёт)
+    defaults = {}
+    for name, parameter in inspect.signature(func).parameters.items():
+        default = parameter.default
+        if default is inspect.Parameter.empty or isinstance(default, params.Depends):
+            continue
+        defaults[name] = default.default if isinstance(default, params.Param) else default
+    return defaults
+
+
+def encode_response(rv, model: Optional[type] = None) -> bytes:
+    # То же тело, что отдал бы ORJSONResponse, сериализуем один раз при промахе.
+    # Как и FastAPI, пропускаем ответ через response_model: лишние поля модели сервиса в тело не попадают
+    with observe_stage("response_encode"):
+        if model is not None:
+            rv = parse_obj_as(model, rv)
+        return orjson.dumps(rv, default=pydantic_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+def cached_response(data: bytes, headers: Optional[dict] = None) -> Response:
+    return Response(content=data, media_type=ORJSONResponse.media_type, headers=headers)
+
+
+def conditional_response(request: Optional[Request], data: bytes, headers: Optional[dict] = None) -> Response:
+    # Тело уже в кеше, поэтому ETag сверяем до отправки и на совпадение отвечаем 304 без тела
+    headers = dict(headers or {})
+    if "etag" not in headers:
+        headers["etag"] = make_etag(data)
+    headers.setdefault("cache-control", f"public, max-age={HTTP_CACHE_MAX_AGE}")
+    if request is not None and is_not_modified(request.headers, headers):
+        return Response(
+            status_code=HTTPStatus.NOT_MODIFIED,
+            headers={name: headers[name] for name in VALIDATOR_HEADERS if name in headers},
+        )
+    return cached_response(data, headers)
+
+
+def page_response(items: list, next_cursor: Optional[str], store: bool = True) -> Response:
+    headers = {}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if not store:
+        headers["Cache-Control"] = "no-store"
+    return cached_response(encode_response(items), headers)
+
+
+async def ndjson_stream(batches: AsyncGenerator[list[dict], None]) -> AsyncIterator[bytes]:
+    # При обрыве соединения Starlette закрывает только этот генератор: закрываем и вложенный,
+    # иначе его finally (закрытие point-in-time) не выполнится
+    try:
+        async for batch in batches:
+            yield b"".join(orjson.dumps(doc) + b"\n" for doc in batch)
+    finally:
+        await batches.aclose()
+
+
+def split_response(rv, model: Optional[type] = None) -> tuple[bytes, dict, bool]:
+    # Эндпоинт может вернуть готовый Response: кешируем тело и его собственные заголовки
+    if not isinstance(rv, Response):
+        return encode_response(rv, model), {}, True
+
+    headers = {name: value for name, value in rv.headers.items() if name not in ("content-length", "content-type")}
+    return rv.body, headers, "no-store" not in headers.get("cache-control", "")
+
+
+async def cached_entities(
+    namespace: str,
+    entity_ids: list[str],
+    fetch,
+    soft_ttl: int = CACHE_TTL,
+    hard_ttl: Optional[int] = None,
+    tag_fields: Optional[dict] = None,
+) -> dict[str, bytes]:
+    # Кешированные id одним MGET, остальные одним mget в ES, дозапись в кеш одним пайплайном.
+    # Ключи общие с детальными эндпоинтами
+    if hard_ttl is None:
+        hard_ttl = soft_ttl + CACHE_STALE_TTL
+    entity_ids = list(dict.fromkeys(entity_ids))
+    cache = await get_redis()
+    keys = dict(zip(entity_ids, await cache_keys.entity_keys(cache, namespace, entity_ids)))
+
+    found = {}
+    for entity_id, raw in zip(entity_ids, await cache.get_many(list(keys.values()))):
+        entry = CacheEntry.unpack(raw)
+        if entry is not None and not entry.is_stale:
+            found[entity_id] = entry.data
+
+    route = current_route.get()
+    CACHE_REQUESTS.inc(len(found), route=route, result="hit")
+    CACHE_REQUESTS.inc(len(entity_ids) - len(found), route=route, result="miss")
+
+    missing = [entity_id for entity_id in entity_ids if entity_id not in found]
+    if missing:
+        backfill = {}
+        for entity_id, entity in (await fetch(missing)).items():
+            found[entity_id] = encode_response(entity)
+            backfill[keys[entity_id]] = CacheEntry.create(found[entity_id], soft_ttl).pack()
+        await cache.cache_many(backfill, hard_ttl)
+        if tag_fields:
+            tagged = {
+                keys[entity_id]: collect_tags(namespace, found[entity_id], False, tag_fields)
+                for entity_id in missing
+                if entity_id in found
+            }
+            await cache.tag_many(tagged, hard_ttl)
+
+    return found
+
+
+async def cached_batch(
+    namespace: str,
+    entity_ids: list[str],
+    fetch,
+    soft_ttl: int = CACHE_TTL,
+    hard_ttl: Optional[int] = None,
+    tag_fields: Optional[dict] = None,
+    request: Optional[Request] = None,
+) -> Response:
+    found = await cached_entities(namespace, entity_ids, fetch, soft_ttl, hard_ttl, tag_fields)
+    body = b",".join(found[entity_id] for entity_id in dict.fromkeys(entity_ids) if entity_id in found)
+    return conditional_response(request, b"[" + body + b"]")
+
+
+class CachedEndpoint:
+    def __init__(
+        self,
+        func,
+        namespace: str,
+        entity_id_param: Optional[str],
+        soft_ttl: int,
+        hard_ttl: int,
+        tag_fields: Optional[dict] = None,
+    ):
+        self.func = func
+        self.name = func.__name__
+        self.namespace = namespace
+        self.entity_id_param = entity_id_param
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.tag_fields = tag_fields
+        self.response_model = response_model(func)
+        self.defaults = default_params(func)
+
+    async def cache_key(self, cache, kwargs: dict) -> str:
+        if self.entity_id_param is not None:
+            return await cache_keys.entity_key(cache, self.namespace, kwargs[self.entity_id_param])
+        return await cache_keys.request_key(cache, self.namespace, self.name, kwargs)
+
+    async def compute(self, kwargs: dict) -> tuple[CacheEntry, bool]:
+        data, headers, store = split_response(await self.func(**kwargs), self.response_model)
+        return (
+            CacheEntry.create(data, self.soft_ttl, {**validators(data, self.entity_id_param is not None), **headers}),
+            store,
+        )
+
+    def keeps_fallback(self, kwargs: dict) -> bool:
+        # Резервная копия живёт неделю и не сбрасывается инвалидацией, поэтому храним её только для
+        # ограниченного набора ключей: детальных записей и первых страниц списков без поиска, фильтров и курсора
+        if self.entity_id_param is not None:
+            return True
+        return all(
+            kwargs.get(name) == default
+            for name, default in self.defaults.items()
+            if name not in FALLBACK_VARYING_PARAMS
+        )
+
+    def tags(self, entry: CacheEntry) -> list[str]:
+        # Детальную запись находим по ключу сущности, теги нужны спискам и вложенным сущностям
+        return collect_tags(self.namespace, entry.data, self.entity_id_param is None, self.tag_fields)
+
+
+# Все закешированные эндпоинты по имени: по ним прогрев восстанавливает запросы
+cached_endpoints: dict[str, CachedEndpoint] = {}
+
+
+def cached(
+    namespace: str,
+    entity_id_param: Optional[str] = None,
+    soft_ttl: int = CACHE_TTL,
+    hard_ttl: Optional[int] = None,
+    tag_fields: Optional[dict] = None,
+):
+    # entity_id_param - детальный эндпоинт: ключ общий с batch-эндпоинтом этой сущности.
+    # tag_fields - вложенные сущности ({поле: пространство имён}), при изменении которых запись сбрасывается.
+    # До soft_ttl значение свежее, между soft_ttl и hard_ttl отдаём устаревшее и обновляем его в фоне
+    if hard_ttl is None:
+        hard_ttl = soft_ttl + CACHE_STALE_TTL
+
     def decorator(func):
+        endpoint = CachedEndpoint(func, namespace, entity_id_param, soft_ttl, hard_ttl, tag_fields)
+        cached_endpoints[endpoint.name] = endpoint
+
         @wraps(func)
-        async def decorated_function(*args, **kwargs):
+        async def decorated_function(**kwargs):
+            request = kwargs.pop(REQUEST_PARAM)
             cache = await get_redis()
-            cache_key = (
-                f"{kwargs['search_query']}:{kwargs['sort_order'].lower()}:{kwargs['sort'].lower()}:"
-                f"{kwargs['page']}:{kwargs['limit']}"
-            )
-            rv = await cache.get_from_cache(cache_key)
-
-            if rv is not None:
-                if many:
-                    entities = orjson.loads(rv)
-                    if not entities:
-                        return []
-                    return [decoder.parse_raw(entity) for entity in rv]
-                return decoder.parse_raw(rv)
-
-            rv = await func(*args, **kwargs)
-            if many:
-                await cache.cache(cache_key, orjson.dumps(rv))
-            else:
-                await cache.cache(cache_key, rv.json())
-
-            return rv
+            cache_key = await endpoint.cache_key(cache, kwargs)
+            if WARMUP_ENABLED:
+                # Без прогрева частоты никто не сбрасывает в Redis: не копим их
+                hot_keys.record(endpoint.name, kwargs)
+
+            async def load(refresh: bool = False) -> Optional[CacheEntry]:
+                token = None
+                if CACHE_LOCK_ENABLED:
+                    token = await cache.acquire_lock(cache_key)
+                    if token is None:
+                        if refresh:
+                            # Фоновое обновление уже идёт в другом воркере
+                            return None
+                        # Значение уже считает другой воркер
+                        entry = await wait_for_cache(cache, cache_key, CACHE_LOCK_TTL)
+                        if entry is not None:
+                            return entry
+
+                try:
+                    entry, store = await endpoint.compute(kwargs)
+                    if store:
+                        packed = entry.pack()
+                        fallback = (
+                            {cache_keys.fallback_key(cache_key): packed} if endpoint.keeps_fallback(kwargs) else {}
+                        )
+                        await asyncio.gather(
+                            cache.cache(cache_key, packed, hard_ttl),
+                            cache.tag_many({cache_key: endpoint.tags(entry)}, hard_ttl),
+                            cache.cache_fallback(fallback, CACHE_FALLBACK_TTL),
+                        )
+                finally:
+                    if token is not None:
+                        await cache.release_lock(cache_key, token)
+
+                return entry
+
+            entry = CacheEntry.unpack(await cache.get_from_cache(cache_key))
+            if entry is not None:
+                CACHE_REQUESTS.inc(route=current_route.get(), result="stale" if entry.is_stale else "hit")
+                if entry.is_stale:
+                    run_in_background(
+                        without_budget(single_flight.do(f"refresh:{cache_key}", lambda: load(refresh=True)))
+                    )
+                return conditional_response(request, entry.data, entry.headers)
+
+            CACHE_REQUESTS.inc(route=current_route.get(), result="miss")
+            try:
+                entry = await single_flight.do(cache_key, load)
+            except BACKEND_ERRORS:
+                # Elasticsearch недоступен или перегружен: отдаём последнюю известную копию, если она есть
+                entry = CacheEntry.unpack(await cache.get_fallback(cache_keys.fallback_key(cache_key)))
+                if entry is None:
+                    raise
+                CACHE_REQUESTS.inc(route=current_route.get(), result="fallback")
+                headers = {**entry.headers, FALLBACK_HEADER: "1", "cache-control": "no-store"}
+                return conditional_response(request, entry.data, headers)
+            return conditional_response(request, entry.data, entry.headers)
 
+        # FastAPI строит зависимости по сигнатуре: добавляем к параметрам эндпоинта запрос
+        signature = inspect.signature(func)
+        request_parameter = inspect.Parameter(REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+        decorated_function.__signature__ = signature.replace(
+            parameters=[*signature.parameters.values(), request_parameter]
+        )
         return decorated_function
 
     return decorator
@@ -0,0 +1,39 @@
+import asyncio
+
+from src.main import app
+
+
+async def get(path: str, query: str = "") -> dict:
+    # Запрос к приложению без сервера: статус, заголовки и тело ответа
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"host", b"test")],
+        "server": ("test", 80),
+        "client": ("test", 1),
+    }
+    response = {"status": None, "headers": {}, "body": b""}
+    received = False
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {name.decode(): value.decode() for name, value in message["headers"]}
+        else:
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response
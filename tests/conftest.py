@@ -0,0 +1,24 @@
+import asyncio
+from typing import Iterator
+
+import pytest
+
+from benchmarks.fakes import FakeElasticsearch, FakeRedis, make_dataset
+from src.db import elastic, redis
+from src.services import genre_catalogue
+from src.services.hot_keys import hot_keys
+
+
+@pytest.fixture
+def fakes(request) -> Iterator[tuple[FakeElasticsearch, FakeRedis]]:
+    # Заглушки вместо Elasticsearch и Redis, кеш процесса и каталог жанров пустые.
+    # Задержку Elasticsearch можно передать через parametrize(..., indirect=True)
+    latency = getattr(request, "param", 0.0)
+    elastic.es = FakeElasticsearch(make_dataset(films=20, people=20, seed=1), latency=latency)
+    redis.redis = FakeRedis()
+    redis.local_cache.clear()
+    genre_catalogue.catalogue = None
+    # Частоты, накопленные предыдущими тестами, сбрасываем в отдельную заглушку
+    asyncio.run(hot_keys.flush(FakeRedis()))
+    yield elastic.es, redis.redis
+    elastic.es = redis.redis = None
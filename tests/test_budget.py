@@ -0,0 +1,23 @@
+import asyncio
+import time
+
+from src.services.background import background_tasks, run_in_background
+from src.services.budget import remaining, request_deadline, without_budget
+
+
+def test_background_refresh_runs_without_request_deadline():
+    async def scenario():
+        request_deadline.set(time.monotonic() + 0.01)
+        seen = []
+
+        async def refresh():
+            await asyncio.sleep(0.02)
+            seen.append(remaining())
+
+        run_in_background(without_budget(refresh()))
+        await asyncio.gather(*background_tasks)
+        return seen, request_deadline.get()
+
+    seen, deadline = asyncio.run(scenario())
+    assert seen == [None]
+    assert deadline is not None
@@ -0,0 +1,26 @@
+import asyncio
+import time
+
+from src.db.redis import get_redis
+from src.services.cache_keys import cache_keys
+from tests.client import get
+
+
+def test_lock_released_without_write_stops_waiting(fakes):
+    async def scenario():
+        cache = await get_redis()
+        key = await cache_keys.entity_key(cache, "films", "nope2")
+        # Другой воркер держит блокировку и снимает её, ничего не записав (у него тоже 404)
+        token = await cache.acquire_lock(key)
+
+        async def release():
+            await asyncio.sleep(0.05)
+            await cache.release_lock(key, token)
+
+        start = time.monotonic()
+        response, _ = await asyncio.gather(get("/v1/films/nope2"), release())
+        return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(scenario())
+    assert response["status"] == 404
+    assert elapsed < 1
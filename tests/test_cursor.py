@@ -0,0 +1,20 @@
+import asyncio
+
+import pytest
+
+from src.services import genre_catalogue
+from tests.client import get
+
+
+@pytest.mark.parametrize("path", ["/v1/films/", "/v1/people/", "/v1/genres/"])
+def test_empty_cursor_page_has_no_next_cursor(fakes, path):
+    response = asyncio.run(get(path, "limit=0&cursor="))
+    assert response["status"] == 200
+    assert response["body"] == b"[]"
+    assert "x-next-cursor" not in response["headers"]
+
+
+def test_empty_catalogue_page_has_no_next_cursor(fakes):
+    asyncio.run(genre_catalogue.refresh())
+    assert genre_catalogue.catalogue.get_page("genre", "asc", "", 0, "") == ([], None)
+    assert genre_catalogue.catalogue.get_page("genre", "desc", "", 0, "") == ([], None)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from tests.client import get
+
+
+def fallback_keys(fake_redis) -> list[str]:
+    return [key for key in fake_redis.store if key.startswith("fallback:")]
+
+
+@pytest.mark.parametrize(
+    "path, query",
+    [
+        ("/v1/films/", ""),
+        ("/v1/films/", "sort=imdb_rating&sort_order=desc"),
+        ("/v1/people/", ""),
+    ],
+)
+def test_fallback_kept_for_first_pages(fakes, path, query):
+    _, fake_redis = fakes
+    assert asyncio.run(get(path, query))["status"] == 200
+    assert len(fallback_keys(fake_redis)) == 1
+
+
+@pytest.mark.parametrize(
+    "path, query",
+    [
+        ("/v1/films/", "search_query=film"),
+        ("/v1/films/", "page=2"),
+        ("/v1/films/", "limit=10"),
+        ("/v1/films/", "cursor="),
+        ("/v1/people/", "search_query=first"),
+    ],
+)
+def test_no_fallback_for_unbounded_keys(fakes, path, query):
+    _, fake_redis = fakes
+    assert asyncio.run(get(path, query))["status"] == 200
+    assert fallback_keys(fake_redis) == []
+
+
+def test_fallback_kept_for_details(fakes):
+    fake_es, fake_redis = fakes
+    film_id = fake_es.indexes["movies"][0]["id"]
+    assert asyncio.run(get(f"/v1/films/{film_id}"))["status"] == 200
+    assert len(fallback_keys(fake_redis)) == 1
@@ -0,0 +1,27 @@
+import datetime
+
+from src.models.genre import Genre
+from src.services import base
+from src.services.genre_catalogue import GenreCatalogue
+
+CREATED = datetime.datetime(2021, 1, 1)
+
+
+def make_catalogue(*names: str) -> GenreCatalogue:
+    genres = [Genre(id=str(i), genre=name, created=CREATED, modified=CREATED) for i, name in enumerate(names)]
+    return GenreCatalogue(genres, (len(genres), None))
+
+
+def test_search_uses_exact_phase_when_it_has_enough_hits(monkeypatch):
+    monkeypatch.setattr(base, "SEARCH_EXACT_MIN_HITS", 1)
+    catalogue = make_catalogue("Action", "Fiction")
+    assert [genre.genre for genre in catalogue.get_list("genre", "asc", "action", 1, 50)] == ["Action"]
+    # Мало точных совпадений - нечёткая фаза, как в Elasticsearch
+    assert [genre.genre for genre in catalogue.get_list("genre", "asc", "acton", 1, 50)] == ["Action"]
+
+
+def test_cursor_pages_search_fuzzy_only(monkeypatch):
+    monkeypatch.setattr(base, "SEARCH_EXACT_MIN_HITS", 1)
+    catalogue = make_catalogue("Action", "Fiction")
+    genres, _ = catalogue.get_page("genre", "asc", "action", 50, "")
+    assert [genre.genre for genre in genres] == ["Action", "Fiction"]
@@ -0,0 +1,15 @@
+import asyncio
+
+from src.db import elastic, redis
+from src.services.hot_keys import hot_keys
+from src.services.warmup import warm_up
+
+
+def test_warm_up_replays_genre_details(fakes):
+    async def scenario():
+        genre_id = elastic.es.indexes["genres"][0]["id"]
+        hot_keys.record("genre_details_elastic", {"genre_id": genre_id})
+        await hot_keys.flush(redis.redis)
+        return await warm_up()
+
+    assert asyncio.run(scenario()) == 1